@@ -0,0 +1,140 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Union
+
+import requests
+
+
+class Backend:
+    """One Ollama instance and its routing statistics"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.base_url = host if host.startswith(("http://", "https://")) else f"http://{host}"
+
+        self.healthy = True
+        self.outstanding = 0
+        self.consecutive_failures = 0
+
+        self.requests = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self.eval_tokens = 0
+        self.ejections = 0
+
+
+class BackendPool:
+    """Routes each request to the healthy backend with the fewest outstanding requests
+
+    A backend is ejected after `eject_after` consecutive failures (requests or
+    health probes) and re-admitted by the first probe that succeeds again.
+    """
+
+    def __init__(self, hosts: Union[str, Iterable[str]], eject_after: int = 3,
+                 probe_interval: float = 15.0, probe_timeout: float = 5.0):
+        if isinstance(hosts, str):
+            hosts = [host.strip() for host in hosts.split(",") if host.strip()]
+        self.backends = [Backend(host) for host in hosts]
+        if not self.backends:
+            raise ValueError("at least one Ollama host is required")
+
+        self.eject_after = eject_after
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._probe_thread = None
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    def acquire(self, exclude: Iterable[Backend] = ()) -> Backend:
+        """Pick a backend for one request and count it as outstanding"""
+        excluded = set(id(backend) for backend in exclude)
+        with self._lock:
+            candidates = [b for b in self.backends if b.healthy and id(b) not in excluded]
+            if not candidates:
+                # Nothing healthy (or everything excluded): still try rather than fail outright
+                candidates = [b for b in self.backends if id(b) not in excluded] or self.backends
+
+            backend = min(candidates, key=lambda b: (b.outstanding, b.requests))
+            backend.outstanding += 1
+            return backend
+
+    def release(self, backend: Backend, ok: bool, seconds: float = 0.0, eval_tokens: int = 0):
+        """Finish a request started with acquire()"""
+        with self._lock:
+            backend.outstanding -= 1
+            backend.requests += 1
+            backend.busy_seconds += seconds
+            backend.eval_tokens += eval_tokens
+
+            if ok:
+                backend.consecutive_failures = 0
+            else:
+                backend.failures += 1
+                self._note_failure(backend)
+
+    def _note_failure(self, backend: Backend):
+        backend.consecutive_failures += 1
+        # Never eject the last healthy backend; there is nowhere else to go
+        others_healthy = any(b.healthy for b in self.backends if b is not backend)
+        if backend.healthy and backend.consecutive_failures >= self.eject_after and others_healthy:
+            backend.healthy = False
+            backend.ejections += 1
+            print(f"⚠️  Ejected Ollama backend {backend.host} after {backend.consecutive_failures} failures")
+
+    def probe(self, session: Optional[requests.Session] = None):
+        """Check every backend once, ejecting dead ones and re-admitting recovered ones"""
+        http = session or requests
+        for backend in self.backends:
+            try:
+                response = http.get(f"{backend.base_url}/api/version", timeout=self.probe_timeout)
+                ok = response.status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+
+            with self._lock:
+                if ok:
+                    backend.consecutive_failures = 0
+                    if not backend.healthy:
+                        backend.healthy = True
+                        print(f"✅ Re-admitted Ollama backend {backend.host}")
+                else:
+                    self._note_failure(backend)
+
+    def start_health_checks(self):
+        """Probe the backends every probe_interval seconds from a daemon thread"""
+        if self._probe_thread is not None:
+            return
+
+        def loop():
+            session = requests.Session()
+            while not self._stop.wait(self.probe_interval):
+                self.probe(session)
+            session.close()
+
+        self._probe_thread = threading.Thread(target=loop, name="ollama-health", daemon=True)
+        self._probe_thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def report(self) -> List[Dict]:
+        """Per-backend request counts and throughput since the pool was created"""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        with self._lock:
+            return [{
+                "host": b.host,
+                "healthy": b.healthy,
+                "outstanding": b.outstanding,
+                "requests": b.requests,
+                "failures": b.failures,
+                "ejections": b.ejections,
+                "eval_tokens": b.eval_tokens,
+                "tokens_per_second": b.eval_tokens / elapsed,
+                "requests_per_minute": b.requests * 60 / elapsed,
+                "mean_latency_seconds": b.busy_seconds / b.requests if b.requests else 0.0
+            } for b in self.backends]
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+
+def queue_delay(result: Dict, wall_seconds: float, first_token_floor: Optional[float] = None) -> Optional[float]:
+    """Seconds a generate call spent waiting rather than being served
+
+    With the server's own timings this is the wall time not covered by loading,
+    prompt evaluation and decoding. A stream we hung up on only has estimated
+    timings, whose prompt_eval_duration is the time to the first token; its excess
+    over the fastest recent first token (first_token_floor) is used instead.
+    """
+    seconds = {name: result.get(name, 0) / 1e9 for name in ("load_duration", "prompt_eval_duration", "eval_duration")}
+    if not result.get("timing_estimated"):
+        if not result.get("total_duration"):
+            return None
+        return max(0.0, wall_seconds - sum(seconds.values()))
+    if first_token_floor is None:
+        return None
+    return max(0.0, seconds["prompt_eval_duration"] - first_token_floor)
+
+
+class AimdController:
+    """Concurrency limit and pacing for generate calls, driven by how the server copes
+
+    Every call takes a slot with acquire() and reports back with release(), or with
+    discard() when its outcome says nothing about the server. A call
+    that failed, needed retries or queued for more than queue_threshold seconds
+    counts as congestion: the limit is multiplied by `backoff` (once per round of
+    calls, so one overloaded burst is only punished once) and calls are spaced by a
+    pause that doubles up to max_pause. Every other call raises the limit by
+    1/limit, about one slot per round, and halves the pause. An idle server
+    therefore gets no pauses and max_limit calls at once, a busy one only as many
+    as it serves without queueing.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, backoff: float = 0.5,
+                 queue_threshold: float = 1.0, max_pause: float = 5.0, window: int = 50):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.backoff = backoff
+        self.queue_threshold = queue_threshold
+        self.max_pause = max_pause
+
+        self.limit = float(self.max_limit)
+        self.pause = 0.0
+        self.in_flight = 0
+        self.congestion_events = 0
+        self._last_cut = 0.0
+        self._next_call = 0.0
+        self._first_tokens = deque(maxlen=window)  # Recent times to first token, for the floor
+        self._condition = threading.Condition()
+
+    @property
+    def first_token_floor(self) -> Optional[float]:
+        with self._condition:
+            return min(self._first_tokens) if self._first_tokens else None
+
+    def acquire(self) -> float:
+        """Wait for a free slot and the pacing pause; returns the start time for release()"""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            now = time.monotonic()
+            wait = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.pause
+        if wait > 0:
+            time.sleep(wait)
+        return time.monotonic()
+
+    def release(self, started: float, queued: Optional[float] = None, failed: bool = False,
+                first_token: Optional[float] = None) -> bool:
+        """Report a finished call; returns True when it counted as congestion"""
+        congested = failed or (queued is not None and queued > self.queue_threshold)
+        with self._condition:
+            self.in_flight -= 1
+            if first_token is not None and not congested:
+                self._first_tokens.append(first_token)
+
+            if congested:
+                self.congestion_events += 1
+                # Calls that started before the last cut saw the old limit; they don't cut again
+                if started >= self._last_cut:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self.pause = min(self.max_pause, max(0.25, self.pause * 2))
+                    self._last_cut = time.monotonic()
+                    print(f"    🚦 Server is pushing back ({'failed call' if failed else f'{queued:.1f}s queued'}): "
+                          f"{int(self.limit)} concurrent calls, {self.pause:.2f}s apart")
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.pause = self.pause / 2 if self.pause > 0.01 else 0.0
+            self._condition.notify_all()
+        return congested
+
+    def discard(self):
+        """Free the slot of a call that says nothing about the server, e.g. one we cancelled"""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                "limit": int(self.limit),
+                "pause_seconds": self.pause,
+                "in_flight": self.in_flight,
+                "congestion_events": self.congestion_events
+            }
@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List
+
+from main_llama3_1_8B import BookGenerator
+from ollama_client import OllamaClient
+
+
+def load_jobs(filename: str) -> List[Dict]:
+    """Read one book job per line; blank lines and '#' comments are skipped"""
+    jobs = []
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                job = {"error": f"invalid JSON: {e}"}
+            job.setdefault("job_id", job.get("id") or f"line-{line_number}")
+            jobs.append(job)
+    return jobs
+
+
+def job_directory(output_dir: str, job: Dict) -> str:
+    """Each job gets its own directory for its progress file, journal and book"""
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(job["job_id"])).strip("_") or "job"
+    return os.path.join(output_dir, slug)
+
+
+class BatchRunner:
+    """Runs a JSONL file of book jobs through a shared worker pool and Ollama client"""
+
+    def __init__(self, ollama_host: str = "127.0.0.1:11434", workers: int = 2, slots: int = 4,
+                 output_dir: str = "books", cache_file: str = "llm_response_cache.sqlite3"):
+        self.ollama_host = ollama_host
+        self.workers = workers
+        self.output_dir = output_dir
+        self.cache_file = cache_file
+
+        # The connection pool is shared, so `slots` caps in-flight requests per host across all jobs
+        self.client = OllamaClient(ollama_host, pool_size=slots)
+        self._results_lock = threading.Lock()
+
+    def run_job(self, job: Dict) -> Dict:
+        """Generate one book and describe the outcome"""
+        outcome = {
+            "job_id": job["job_id"],
+            "topic": job.get("topic"),
+            "model": job.get("model"),
+            "started": datetime.now().isoformat()
+        }
+        started = time.monotonic()
+        generator = None
+
+        try:
+            if "error" in job:
+                raise ValueError(job["error"])
+            if not job.get("topic"):
+                raise ValueError("job has no topic")
+
+            generator = BookGenerator(ollama_host=self.ollama_host, model=job.get("model", "llama3.1:8b"),
+                                      cache_file=self.cache_file, client=self.client)
+            if job.get("target_pages"):
+                generator.target_pages = int(job["target_pages"])
+                generator.target_words = generator.words_per_page * generator.target_pages
+            generator.generation_options.update(job.get("options", {}))
+            # Jobs run side by side in this process, so their section bodies stay on disk
+            generator.store_sections = job.get("store_sections", True)
+            outcome["model"] = generator.model
+
+            directory = job_directory(self.output_dir, job)
+            os.makedirs(directory, exist_ok=True)
+
+            outcome["output_file"] = generator.generate_book(job["topic"], resume=job.get("resume", True),
+                                                             output_dir=directory)
+            outcome["status"] = "completed"
+            outcome["sections"] = generator.sections.written_count
+            outcome["words"] = generator.sections.total_words
+
+        except Exception as e:
+            outcome["status"] = "failed"
+            outcome["error"] = f"{type(e).__name__}: {e}"
+
+        finally:
+            # Failed jobs too: the next job must not inherit open SQLite handles
+            if generator is not None:
+                generator.close()
+
+        outcome["elapsed_seconds"] = round(time.monotonic() - started, 3)
+        return outcome
+
+    def run(self, jobs_file: str, results_file: str) -> List[Dict]:
+        """Run every job, appending one outcome line to results_file as each job finishes"""
+        jobs = load_jobs(jobs_file)
+        print(f"📚 {len(jobs)} book jobs, {self.workers} at a time")
+
+        outcomes = []
+        with open(results_file, 'a', encoding='utf-8') as results, \
+                ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.run_job, job): job for job in jobs}
+
+            for future in as_completed(futures):
+                outcome = future.result()
+                outcomes.append(outcome)
+
+                with self._results_lock:
+                    results.write(json.dumps(outcome, ensure_ascii=False) + "\n")
+                    results.flush()
+
+                icon = "✅" if outcome["status"] == "completed" else "❌"
+                print(f"{icon} {outcome['job_id']}: {outcome['status']} in {outcome['elapsed_seconds']:.0f}s")
+
+        return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate many books from a JSONL file of jobs")
+    parser.add_argument("jobs", nargs="?", default="requests.jsonl",
+                        help='JSONL with one job per line: {"topic", "model", "target_pages", "options"}')
+    parser.add_argument("--results", default="batch_results.jsonl", help="JSONL file outcomes are appended to")
+    parser.add_argument("--output-dir", default="books", help="Directory for per-job progress and books")
+    parser.add_argument("--host", default="127.0.0.1:11434", help="Ollama host, or several separated by commas")
+    parser.add_argument("--workers", type=int, default=2, help="Books generated at the same time")
+    parser.add_argument("--slots", type=int, default=4, help="Maximum concurrent requests per Ollama host")
+    args = parser.parse_args()
+
+    runner = BatchRunner(ollama_host=args.host, workers=args.workers, slots=args.slots,
+                         output_dir=args.output_dir)
+    outcomes = runner.run(args.jobs, args.results)
+
+    completed = sum(1 for outcome in outcomes if outcome["status"] == "completed")
+    print(f"\n📊 {completed}/{len(outcomes)} jobs completed, results in {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict
+
+from inference_metrics import InferenceMetrics
+from main_llama3_1_8B import BookGenerator
+from mock_ollama import MockOllamaServer
+from progress_journal import ProgressJournal
+from section_table import SectionTable
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def make_generator(server: MockOllamaServer, target_pages: int) -> BookGenerator:
+    generator = BookGenerator(ollama_host=server.address, cache_file=None, length_file=None)
+    generator.target_pages = target_pages
+    generator.target_words = generator.words_per_page * target_pages
+    return generator
+
+
+def time_calls(generator: BookGenerator, timings: list):
+    """Record the wall time of every generate_content call made by the generator"""
+    generate_content = generator.generate_content
+
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return generate_content(*args, **kwargs)
+        finally:
+            timings.append(time.perf_counter() - started)
+
+    generator.generate_content = timed
+
+
+def bench_sections(server: MockOllamaServer, sections: int, target_pages: int) -> Dict:
+    """generate_section on its own: per-call latency and client overhead"""
+    generator = make_generator(server, target_pages)
+    generator.sections = SectionTable.from_outline(generator.create_book_outline("benchmark"))
+    # A streamed request the client hangs up on keeps the mock busy a little longer than the
+    # client waits, so plain requests are used to get an exact server-side time per call
+    generator.stream = False
+
+    timings = []
+    time_calls(generator, timings)
+    server.request_log.clear()
+
+    outline = list(generator.sections)
+
+    started = time.perf_counter()
+    words = 0
+    try:
+        for section in (outline * (sections // len(outline) + 1))[:sections]:
+            chapter = generator.sections.chapter_of(section)
+            words += len(generator.generate_section("benchmark", chapter.part, chapter.title, section).split())
+        elapsed = time.perf_counter() - started
+    finally:
+        # generate_book would shut the post-processing pool down; generate_section leaves it running
+        generator.close()
+
+    # What the server spent serving us versus what the caller waited
+    server_seconds = sum(entry["service_seconds"] + entry["queued_seconds"] for entry in server.request_log)
+    calls = len(timings)
+    return {
+        "sections": sections,
+        "calls": calls,
+        "words": words,
+        "elapsed_seconds": elapsed,
+        "sections_per_hour": sections * 3600 / elapsed,
+        "call_latency_p50_seconds": percentile(timings, 0.5),
+        "call_latency_p99_seconds": percentile(timings, 0.99),
+        "client_overhead_per_call_seconds": (sum(timings) - server_seconds) / calls if calls else 0.0,
+        "section_overhead_per_section_seconds": (elapsed - sum(timings)) / sections
+    }
+
+
+def bench_book(server: MockOllamaServer, target_pages: int, workdir: str) -> Dict:
+    """generate_book end to end, with peak memory"""
+    generator = make_generator(server, target_pages)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    generator.generate_book("benchmark", resume=False, output_dir=workdir)
+    elapsed = time.perf_counter() - started
+    _, peak_python = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sections = generator.sections.written_count
+    return {
+        "sections": sections,
+        "words": generator.sections.total_words,
+        "elapsed_seconds": elapsed,
+        "sections_per_hour": sections * 3600 / elapsed,
+        "peak_python_heap_bytes": peak_python,
+        "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    }
+
+
+def bench_checkpoints(server: MockOllamaServer, target_pages: int, workdir: str, repeats: int) -> Dict:
+    """Cost of journalling one section, compacting the journal and re-rendering the book"""
+    generator = make_generator(server, target_pages)
+    generator.load_progress(os.path.join(workdir, "benchmark_book_progress.json"))
+
+    progress_file = os.path.join(workdir, "checkpoint_progress.json")
+    output_file = os.path.join(workdir, "checkpoint_book.md")
+
+    generator.journal = ProgressJournal(progress_file)
+
+    written = list(generator.sections.written())
+    if not written:
+        raise RuntimeError("the benchmark book has no sections; raise --pages so sections exceed 100 words")
+    record_times, compact_times, render_times = [], [], []
+    for attempt in range(repeats):
+        section = written[attempt % len(written)]
+
+        started = time.perf_counter()
+        generator.record_section(section, section.content)
+        record_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        generator.save_book_to_file("benchmark", output_file)
+        render_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        generator.save_progress(progress_file)
+        compact_times.append(time.perf_counter() - started)
+
+    generator.journal.close()
+    return {
+        "repeats": repeats,
+        "record_section_mean_seconds": statistics.mean(record_times),
+        "save_book_mean_seconds": statistics.mean(render_times),
+        "save_progress_mean_seconds": statistics.mean(compact_times),
+        "progress_file_bytes": os.path.getsize(progress_file)
+    }
+
+
+def bench_hedging(args, calls: int, concurrency: int = 4, words: int = 100) -> Dict:
+    """Call latency over two stalling mock backends, without and with hedged requests"""
+    results = {}
+    for arm, percentile_setting in (("unhedged", None), ("hedged", 0.95)):
+        servers = [MockOllamaServer(latency=args.latency, latency_sigma=args.latency_sigma,
+                                    tokens_per_second=args.tokens_per_second, parallel=args.parallel,
+                                    stall_probability=args.stall_probability, stall_seconds=args.stall_seconds,
+                                    seed=args.seed + index) for index in range(2)]
+        for server in servers:
+            server.start()
+        try:
+            generator = BookGenerator(ollama_host=",".join(server.address for server in servers),
+                                      cache_file=None, length_file=None, hedge_percentile=percentile_setting)
+            timings = []
+            time_calls(generator, timings)
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                def run(count: int):
+                    prompts = [f"Write about topic {index}." for index in range(count)]
+                    list(pool.map(lambda prompt: generator.generate_content(prompt, stop_at_words=words), prompts))
+
+                # Both arms warm up, so the hedged one has learned its delay before timing starts
+                run(50)
+                del timings[:]
+                generator.metrics = InferenceMetrics()
+                run(calls)
+            generator.client.close()
+        finally:
+            for server in servers:
+                server.stop()
+
+        book = generator.metrics.book
+        results[f"call_latency_p50_{arm}_seconds"] = percentile(timings, 0.5)
+        results[f"call_latency_p99_{arm}_seconds"] = percentile(timings, 0.99)
+        if percentile_setting:
+            results["hedged_requests"] = book.hedged
+            results["hedge_wins"] = book.hedge_wins
+
+    results["calls"] = calls
+    results["p99_drop_seconds"] = (results["call_latency_p99_unhedged_seconds"]
+                                   - results["call_latency_p99_hedged_seconds"])
+    return results
+
+
+def compare(results: Dict, baseline_file: str, tolerance: float) -> list:
+    """Metrics that got worse than the baseline by more than `tolerance`"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)["results"]
+
+    # (group, metric, True when higher is better)
+    watched = [
+        ("sections", "sections_per_hour", True),
+        ("sections", "client_overhead_per_call_seconds", False),
+        ("book", "sections_per_hour", True),
+        ("book", "peak_python_heap_bytes", False),
+        ("checkpoints", "record_section_mean_seconds", False),
+        ("checkpoints", "save_book_mean_seconds", False),
+        ("hedging", "call_latency_p99_hedged_seconds", False),
+    ]
+    regressions = []
+    for group, metric, higher_is_better in watched:
+        old = baseline.get(group, {}).get(metric)
+        new = results.get(group, {}).get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{group}.{metric}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the book generator against a mock Ollama server")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--latency", type=float, default=0.05, help="Median server startup latency (s)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread of the latency")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0, help="Mean decode speed")
+    parser.add_argument("--tokens-per-second-jitter", type=float, default=0.2, help="Relative spread of the speed")
+    parser.add_argument("--parallel", type=int, default=4, help="Requests the mock serves at once")
+    parser.add_argument("--pages", type=int, default=40, help="target_pages of the benchmark book")
+    parser.add_argument("--sections", type=int, default=8, help="Sections for the generate_section run")
+    parser.add_argument("--checkpoint-repeats", type=int, default=20)
+    parser.add_argument("--hedge-calls", type=int, default=200, help="Calls per hedging run (0 skips it)")
+    parser.add_argument("--stall-probability", type=float, default=0.05,
+                        help="Share of requests that stall in the hedging run")
+    parser.add_argument("--stall-seconds", type=float, default=5.0, help="How long a stalled request hangs")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    server = MockOllamaServer(latency=args.latency, latency_sigma=args.latency_sigma,
+                              tokens_per_second=args.tokens_per_second,
+                              tokens_per_second_jitter=args.tokens_per_second_jitter,
+                              parallel=args.parallel, seed=args.seed)
+
+    with server, tempfile.TemporaryDirectory() as workdir:
+        print("⏱️  generate_section ...")
+        sections = bench_sections(server, args.sections, args.pages)
+        print("⏱️  generate_book ...")
+        book = bench_book(server, args.pages, workdir)
+        print("⏱️  checkpoints ...")
+        checkpoints = bench_checkpoints(server, args.pages, workdir, args.checkpoint_repeats)
+    hedging = {}
+    if args.hedge_calls:
+        print("⏱️  hedged requests ...")
+        hedging = bench_hedging(args, args.hedge_calls)
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "config": vars(args),
+        "results": {"sections": sections, "book": book, "checkpoints": checkpoints, "hedging": hedging}
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n📊 Benchmark results ({args.output})")
+    print(f"   generate_section: {sections['sections_per_hour']:.0f} sections/hour, "
+          f"{sections['client_overhead_per_call_seconds'] * 1000:.1f} ms client overhead per call")
+    print(f"   generate_book:    {book['sections_per_hour']:.0f} sections/hour, "
+          f"peak heap {book['peak_python_heap_bytes'] / 1e6:.1f} MB")
+    print(f"   checkpoints:      {checkpoints['record_section_mean_seconds'] * 1000:.2f} ms per section, "
+          f"{checkpoints['save_progress_mean_seconds'] * 1000:.1f} ms per snapshot, "
+          f"{checkpoints['save_book_mean_seconds'] * 1000:.1f} ms per book render")
+    if hedging:
+        print(f"   hedging:          p99 {hedging['call_latency_p99_unhedged_seconds']:.2f}s -> "
+              f"{hedging['call_latency_p99_hedged_seconds']:.2f}s, {hedging['hedged_requests']} of "
+              f"{hedging['calls']} calls hedged, {hedging['hedge_wins']} won by the duplicate")
+
+    if args.baseline:
+        regressions = compare(report["results"], args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"   ❌ Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("   ✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
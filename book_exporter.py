@@ -0,0 +1,327 @@
+import argparse
+import html
+import multiprocessing
+import os
+import re
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from book_renderer import markdown_chapter, markdown_statistics, markdown_title, markdown_toc
+from section_table import SectionTable
+
+FORMATS = ("md", "html", "epub")
+
+_FENCE_RE = re.compile(r"^\s*```")
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$")
+_BULLET_RE = re.compile(r"^\s*[-*+]\s+(.*)$")
+_NUMBERED_RE = re.compile(r"^\s*\d+[.)]\s+(.*)$")
+_INLINE_CODE_RE = re.compile(r"`([^`]+)`")
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+_ITALIC_RE = re.compile(r"(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?![*\w])")
+_CODE_SLOT_RE = re.compile(r"\x00(\d+)\x00")
+
+_STYLE = ("body{font-family:Georgia,serif;max-width:46em;margin:2em auto;padding:0 1em;line-height:1.6}"
+          "pre{background:#f4f4f4;padding:.8em;overflow-x:auto}code{font-family:monospace}")
+
+
+def _emphasis(tag: str, match: re.Match) -> str:
+    # A match holding a tag would cross it, as in "**bold *both** italic*"; leave it as text
+    inner = match.group(1)
+    return match.group(0) if "<" in inner else f"<{tag}>{inner}</{tag}>"
+
+
+def inline_html(text: str) -> str:
+    # Code spans are set aside first so asterisks inside them never pair up as emphasis
+    spans: List[str] = []
+
+    def stash(match: re.Match) -> str:
+        spans.append(f"<code>{html.escape(match.group(1), quote=False)}</code>")
+        return f"\x00{len(spans) - 1}\x00"
+
+    text = _INLINE_CODE_RE.sub(stash, text.replace("\x00", ""))
+    text = html.escape(text, quote=False)
+    text = _BOLD_RE.sub(lambda m: _emphasis("strong", m), text)
+    text = _ITALIC_RE.sub(lambda m: _emphasis("em", m), text)
+    return _CODE_SLOT_RE.sub(lambda m: spans[int(m.group(1))], text)
+
+
+def markdown_to_html(text: str) -> str:
+    """Well-formed (X)HTML for the markdown the model writes
+
+    Covers headings, paragraphs, bullet and numbered lists, fenced code, rules and
+    bold/italic/code spans; anything else is kept as escaped paragraph text.
+    """
+    out: List[str] = []
+    paragraph: List[str] = []
+    list_tag: Optional[str] = None
+    code: Optional[List[str]] = None
+
+    def close_paragraph():
+        if paragraph:
+            out.append(f"<p>{inline_html(' '.join(paragraph))}</p>")
+            paragraph.clear()
+
+    def close_list():
+        nonlocal list_tag
+        if list_tag:
+            out.append(f"</{list_tag}>")
+            list_tag = None
+
+    def code_block(lines: List[str]) -> str:
+        return "<pre><code>" + html.escape("\n".join(lines), quote=False) + "</code></pre>"
+
+    for line in text.split("\n"):
+        if code is not None:
+            if _FENCE_RE.match(line):
+                out.append(code_block(code))
+                code = None
+            else:
+                code.append(line)
+            continue
+
+        if _FENCE_RE.match(line):
+            close_paragraph()
+            close_list()
+            code = []
+            continue
+
+        stripped = line.strip()
+        heading = _HEADING_RE.match(stripped)
+        item = _BULLET_RE.match(line) or _NUMBERED_RE.match(line)
+
+        if not stripped:
+            close_paragraph()
+            close_list()
+        elif heading:
+            close_paragraph()
+            close_list()
+            level = len(heading.group(1))
+            out.append(f"<h{level}>{inline_html(heading.group(2))}</h{level}>")
+        elif stripped in ("---", "***", "___"):
+            close_paragraph()
+            close_list()
+            out.append("<hr/>")
+        elif item:
+            close_paragraph()
+            tag = "ul" if _BULLET_RE.match(line) else "ol"
+            if list_tag != tag:
+                close_list()
+                out.append(f"<{tag}>")
+                list_tag = tag
+            out.append(f"<li>{inline_html(item.group(1))}</li>")
+        else:
+            close_list()
+            paragraph.append(stripped)
+
+    if code is not None:
+        out.append(code_block(code))
+    close_paragraph()
+    close_list()
+    return "\n".join(out)
+
+
+def render_chapter(number: int, part: str, title: str, sections: List[Tuple[str, Optional[str], int]],
+                   formats: Tuple[str, ...]) -> Dict:
+    """Every requested format of one chapter; runs in a worker process
+
+    Returns the markdown block, an HTML fragment for the single-page book, a complete
+    XHTML document for the EPUB and the chapter's word count.
+    """
+    markdown, words = markdown_chapter(title, sections)
+    rendered = {"words": words}
+    if "md" in formats:
+        rendered["md"] = markdown
+
+    if "html" in formats or "epub" in formats:
+        body = [f'<h2 id="chapter-{number}">{html.escape(title)}</h2>']
+        for section_title, content, _ in sections:
+            body.append(f"<h3>{html.escape(section_title)}</h3>")
+            body.append(markdown_to_html(content) if content is not None
+                        else "<p><em>[Content pending generation]</em></p>")
+        body = "\n".join(body)
+
+        if "html" in formats:
+            rendered["html"] = f'<section class="chapter">\n{body}\n</section>\n'
+        if "epub" in formats:
+            rendered["xhtml"] = (
+                '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+                '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">\n'
+                f"<head><title>{html.escape(title)}</title></head>\n<body>\n"
+                f'<p class="part">{html.escape(part)}</p>\n{body}\n</body>\n</html>\n')
+    return rendered
+
+
+class BookExporter:
+    """Writes Markdown, HTML and EPUB versions of a book in one pass over its sections
+
+    Chapters are handed to a process pool with at most `window` of them in flight
+    and written to every output file in order as they come back, so memory stays
+    bounded by a few chapters whatever the size of the book. Every file is written
+    next to its final name and renamed into place at the end. workers=0 renders in
+    this process.
+    """
+
+    def __init__(self, formats: Tuple[str, ...] = FORMATS, workers: Optional[int] = None,
+                 words_per_page: int = 250):
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"unknown export formats: {', '.join(sorted(unknown))}")
+        self.formats = tuple(formats)
+        # As for chunk post-processing: a single core is better off rendering inline
+        self.workers = min(4, (os.cpu_count() or 1) - 1) if workers is None else workers
+        self.window = max(2, 2 * self.workers)
+        self.words_per_page = words_per_page
+
+    def _rendered_chapters(self, sections: SectionTable) -> Iterator[Dict]:
+        """Rendered chapters in book order, read from the table one chapter at a time"""
+        def task(chapter) -> tuple:
+            rows = [(section.title, section.content, section.word_count)
+                    for section in sections.chapter_sections(chapter)]
+            return chapter.id + 1, chapter.part, chapter.title, rows, self.formats
+
+        if self.workers <= 0:
+            for chapter in sections.chapters:
+                yield render_chapter(*task(chapter))
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            in_flight: deque = deque()
+            for chapter in sections.chapters:
+                in_flight.append(pool.submit(render_chapter, *task(chapter)))
+                if len(in_flight) >= self.window:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    def export(self, topic: str, sections: SectionTable, basename: str) -> Dict[str, str]:
+        """Write basename.md / .html / .epub for the requested formats and return their paths"""
+        paths = {fmt: f"{basename}.{fmt}" for fmt in self.formats}
+        title = f"{topic.title()}: A Comprehensive Guide"
+        files = {}
+        epub: Optional[zipfile.ZipFile] = None
+
+        try:
+            if "md" in paths:
+                files["md"] = open(f"{paths['md']}.tmp", 'w', encoding='utf-8')
+                files["md"].write(markdown_title(topic))
+                files["md"].write(markdown_toc(sections))
+            if "html" in paths:
+                files["html"] = open(f"{paths['html']}.tmp", 'w', encoding='utf-8')
+                files["html"].write(self._html_head(title, sections))
+            if "epub" in paths:
+                epub = self._open_epub(f"{paths['epub']}.tmp", title, sections)
+
+            total_words = 0
+            part = None
+            for chapter, rendered in zip(sections.chapters, self._rendered_chapters(sections)):
+                if chapter.part != part:
+                    part = chapter.part
+                    if "md" in files:
+                        files["md"].write(f"# {part}\n\n")
+                    if "html" in files:
+                        files["html"].write(f"<h1>{html.escape(part)}</h1>\n")
+                if "md" in files:
+                    files["md"].write(rendered["md"])
+                if "html" in files:
+                    files["html"].write(rendered["html"])
+                if epub is not None:
+                    epub.writestr(f"OEBPS/chapter-{chapter.id + 1}.xhtml", rendered["xhtml"])
+                total_words += rendered["words"]
+
+            if "md" in files:
+                files["md"].write(markdown_statistics(total_words, self.words_per_page, sections.written_count))
+            if "html" in files:
+                files["html"].write(f"<hr/>\n<p>{total_words:,} words, about "
+                                    f"{total_words // self.words_per_page} pages, {sections.written_count} "
+                                    f"sections. Generated {datetime.now().strftime('%B %d, %Y')}.</p>\n"
+                                    "</body>\n</html>\n")
+        finally:
+            for f in files.values():
+                f.close()
+            if epub is not None:
+                epub.close()
+
+        for path in paths.values():
+            os.replace(f"{path}.tmp", path)
+        return paths
+
+    @staticmethod
+    def _html_head(title: str, sections: SectionTable) -> str:
+        lines = ['<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8"/>',
+                 f"<title>{html.escape(title)}</title>\n<style>{_STYLE}</style>\n</head>\n<body>",
+                 f"<h1>{html.escape(title)}</h1>",
+                 f"<p><em>Generated on {datetime.now().strftime('%B %d, %Y')}</em></p>",
+                 "<nav>\n<h2>Table of Contents</h2>\n<ul>"]
+        for chapter in sections.chapters:
+            lines.append(f'<li><a href="#chapter-{chapter.id + 1}">{html.escape(chapter.title)}</a></li>')
+        lines.append("</ul>\n</nav>\n")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _open_epub(path: str, title: str, sections: SectionTable) -> zipfile.ZipFile:
+        """Start an EPUB 3 container; the chapter files are added as they are rendered"""
+        epub = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        # The mimetype entry must come first and be stored uncompressed
+        epub.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        epub.writestr("META-INF/container.xml",
+                      '<?xml version="1.0" encoding="utf-8"?>\n'
+                      '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+                      '<rootfiles><rootfile full-path="OEBPS/content.opf" '
+                      'media-type="application/oebps-package+xml"/></rootfiles>\n</container>\n')
+
+        chapters = [(f"chapter-{chapter.id + 1}", chapter.title) for chapter in sections.chapters]
+        manifest = "\n".join(f'<item id="{name}" href="{name}.xhtml" media-type="application/xhtml+xml"/>'
+                             for name, _ in chapters)
+        spine = "\n".join(f'<itemref idref="{name}"/>' for name, _ in chapters)
+        epub.writestr("OEBPS/content.opf",
+                      '<?xml version="1.0" encoding="utf-8"?>\n'
+                      '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">\n'
+                      '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+                      f'<dc:identifier id="book-id">urn:uuid:{uuid.uuid4()}</dc:identifier>\n'
+                      f"<dc:title>{html.escape(title)}</dc:title>\n<dc:language>en</dc:language>\n"
+                      f'<meta property="dcterms:modified">{datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}</meta>\n'
+                      "</metadata>\n<manifest>\n"
+                      '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>\n'
+                      f"{manifest}\n</manifest>\n<spine>\n{spine}\n</spine>\n</package>\n")
+
+        links = "\n".join(f'<li><a href="{name}.xhtml">{html.escape(chapter_title)}</a></li>'
+                          for name, chapter_title in chapters)
+        epub.writestr("OEBPS/nav.xhtml",
+                      '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+                      '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">\n'
+                      f"<head><title>{html.escape(title)}</title></head>\n<body>\n"
+                      f'<nav epub:type="toc"><h1>Table of Contents</h1>\n<ol>\n{links}\n</ol></nav>\n'
+                      "</body>\n</html>\n")
+        return epub
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a generated book as Markdown, HTML and EPUB")
+    parser.add_argument("progress_file", help="The book's *_book_progress.json")
+    parser.add_argument("--topic", help="Book topic (default: taken from the progress file name)")
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--workers", type=int, help="Rendering processes (0 renders inline)")
+    args = parser.parse_args()
+
+    from main_llama3_1_8B import BookGenerator
+
+    generator = BookGenerator(cache_file=None, length_file=None)
+    if not generator.load_progress(args.progress_file):
+        parser.error(f"no progress found in {args.progress_file}")
+
+    basename = args.progress_file[:-len("_progress.json")] if args.progress_file.endswith("_progress.json") \
+        else os.path.splitext(args.progress_file)[0]
+    topic = args.topic or os.path.basename(basename).replace("_book", "").replace("_", " ")
+
+    exporter = BookExporter(tuple(args.formats), workers=args.workers, words_per_page=generator.words_per_page)
+    for fmt, path in exporter.export(topic, generator.sections, basename).items():
+        print(f"📄 {fmt}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from section_table import Chapter, SectionTable
+
+
+def markdown_title(topic: str) -> str:
+    return (f"# {topic.title()}: A Comprehensive Guide\n\n"
+            f"*Generated on {datetime.now().strftime('%B %d, %Y')}*\n\n"
+            "---\n\n")
+
+
+def markdown_toc(sections: SectionTable) -> str:
+    lines = ["## Table of Contents\n\n"]
+    part = None
+    for chapter in sections.chapters:
+        if chapter.part != part:
+            if part is not None:
+                lines.append("\n")
+            lines.append(f"### {chapter.part}\n")
+            part = chapter.part
+        lines.append(f"- {chapter.title}\n")
+        for section in sections.chapter_sections(chapter):
+            lines.append(f"  - {section.title}\n")
+    if part is not None:
+        lines.append("\n")
+    lines.append("---\n\n")
+    return "".join(lines)
+
+
+def markdown_chapter(title: str, sections: Iterable[Tuple[str, Optional[str], int]]) -> Tuple[str, int]:
+    """Markdown block and word count of one chapter from (title, content, word_count) rows"""
+    pieces = [f"## {title}\n\n"]
+    words = 0
+
+    for section_title, content, word_count in sections:
+        pieces.append(f"### {section_title}\n\n")
+
+        if content is not None:
+            pieces.append(f"{content}\n\n")
+            words += word_count
+        else:
+            pieces.append("*[Content pending generation]*\n\n")
+
+    pieces.append("---\n\n")
+    return "".join(pieces), words
+
+
+def markdown_statistics(total_words: int, words_per_page: int, written_count: int) -> str:
+    return (f"\n## Book Statistics\n\n"
+            f"- **Total Words**: {total_words:,}\n"
+            f"- **Estimated Pages**: {total_words // words_per_page}\n"
+            f"- **Completion**: {written_count} sections\n"
+            f"- **Generated**: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}\n")
+
+
+class IncrementalBookRenderer:
+    """Renders the markdown book, rebuilding only chapters that changed
+
+    Rendered chapters are not kept in memory. Instead the renderer remembers where
+    each chapter's block sits in the file it wrote last, and the next render copies
+    unchanged blocks straight from that file and re-renders only the dirty chapters.
+    The new version goes to a temp file that is renamed over the previous one. If the
+    file was changed by anyone else in between, every chapter is rendered again.
+    """
+
+    def __init__(self, words_per_page: int = 250):
+        self.words_per_page = words_per_page
+
+        self._versions: List[str] = []  # section id -> timestamp of the rendered content
+        self._blocks: Dict[int, Tuple[int, int, int]] = {}  # chapter id -> (offset, length, words) in _filename
+        self._dirty: Set[int] = set()
+
+        self._filename = None
+        self._file_stamp = None  # (size, mtime_ns) of _filename right after we wrote it
+
+        self._toc = ""
+        self._table = None
+
+    def sync(self, sections: SectionTable):
+        """Mark chapters whose sections were added or rewritten since the last render"""
+        if sections is not self._table:
+            self._toc = self._render_toc(sections)
+            self._table = sections
+            self._versions = [None] * len(sections)
+            self._blocks.clear()
+            self._dirty = set(range(len(sections.chapters)))
+
+        versions = self._versions
+        for section in sections:
+            version = section.timestamp if section.written else None
+            if versions[section.id] != version:
+                versions[section.id] = version
+                self._dirty.add(section.chapter_id)
+
+    @staticmethod
+    def _render_toc(sections: SectionTable) -> str:
+        return markdown_toc(sections)
+
+    @staticmethod
+    def _render_chapter(chapter: Chapter, sections: SectionTable) -> Tuple[str, int]:
+        return markdown_chapter(chapter.title, ((section.title, section.content, section.word_count)
+                                                for section in sections.chapter_sections(chapter)))
+
+    @staticmethod
+    def _stamp(filename: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def render(self, topic: str, filename: str, sections: SectionTable) -> int:
+        """Rebuild dirty chapters, write the book atomically and return its word count"""
+        self.sync(sections)
+
+        previous = None
+        if filename == self._filename and self._blocks and self._stamp(filename) == self._file_stamp:
+            previous = open(filename, 'rb')
+        else:
+            self._blocks.clear()
+
+        tmp_filename = f"{filename}.tmp"
+        total_words = 0
+        blocks: Dict[int, Tuple[int, int, int]] = {}
+
+        try:
+            with open(tmp_filename, 'wb') as f:
+                # Title page
+                f.write(markdown_title(topic).encode('utf-8'))
+
+                f.write(self._toc.encode('utf-8'))
+
+                # Book content
+                part = None
+                for chapter in sections.chapters:
+                    if chapter.part != part:
+                        f.write(f"# {chapter.part}\n\n".encode('utf-8'))
+                        part = chapter.part
+
+                    block = self._blocks.get(chapter.id)
+                    if previous is not None and block is not None and chapter.id not in self._dirty:
+                        offset, length, words = block
+                        previous.seek(offset)
+                        data = previous.read(length)
+                    else:
+                        markdown, words = self._render_chapter(chapter, sections)
+                        data = markdown.encode('utf-8')
+
+                    blocks[chapter.id] = (f.tell(), len(data), words)
+                    f.write(data)
+                    total_words += words
+
+                # Statistics
+                f.write(markdown_statistics(total_words, self.words_per_page,
+                                            sections.written_count).encode('utf-8'))
+        finally:
+            if previous is not None:
+                previous.close()
+
+        os.replace(tmp_filename, filename)
+        self._blocks = blocks
+        self._dirty.clear()
+        self._filename = filename
+        self._file_stamp = self._stamp(filename)
+        return total_words
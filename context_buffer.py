@@ -0,0 +1,57 @@
+from collections import deque
+from typing import Dict, Optional
+
+from section_table import SectionTable
+
+
+class ContextBuffer:
+    """Bounded rolling context for prompts
+
+    Keeps only what create_context_prompt can actually use: the tails of the most
+    recent sections book-wide, and the running tail of every chapter. Appending is
+    O(max_chars) no matter how long the book gets.
+    """
+
+    def __init__(self, max_chars: int = 2000, max_sections: int = 8):
+        self.max_chars = max_chars
+        self._recent = deque(maxlen=max_sections)
+        self._chapter_tails: Dict[int, str] = {}  # chapter id -> running tail
+
+    def append(self, chapter_id: int, text: str):
+        """Record a finished section"""
+        if not text:
+            return
+
+        tail = text[-self.max_chars:]
+        self._recent.append(tail)
+
+        previous = self._chapter_tails.get(chapter_id)
+        joined = f"{previous}\n\n{tail}" if previous else tail
+        self._chapter_tails[chapter_id] = joined[-self.max_chars:]
+
+    def tail(self, max_chars: Optional[int] = None) -> str:
+        """Last characters written anywhere in the book"""
+        limit = max_chars or self.max_chars
+        pieces = []
+        size = 0
+        for text in reversed(self._recent):
+            pieces.append(text)
+            size += len(text) + 2
+            if size >= limit:
+                break
+        return "\n\n".join(reversed(pieces))[-limit:]
+
+    def chapter_tail(self, chapter_id: int, max_chars: Optional[int] = None) -> str:
+        """Last characters written in one chapter"""
+        limit = max_chars or self.max_chars
+        return self._chapter_tails.get(chapter_id, "")[-limit:]
+
+    def clear(self):
+        self._recent.clear()
+        self._chapter_tails.clear()
+
+    def rebuild(self, sections: SectionTable):
+        """Replay completed sections in book order, e.g. after load_progress"""
+        self.clear()
+        for section in sections.written():
+            self.append(section.chapter_id, section.content)
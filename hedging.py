@@ -0,0 +1,103 @@
+import socket
+import threading
+from collections import deque
+from typing import Optional
+
+
+class LatencyTracker:
+    """Recent times to first token and the hedge delay learned from them
+
+    Time to first token covers queueing, loading and prompt evaluation but not
+    decoding, so it does not grow with the number of tokens asked for. The delay is
+    the `percentile` of the last `window` calls, so only calls slower to start than
+    nearly all recent ones get a duplicate. Nothing is hedged until
+    min_samples calls have been seen, and never sooner than min_delay seconds.
+    """
+
+    def __init__(self, percentile: float = 0.95, window: int = 200, min_samples: int = 20,
+                 min_delay: float = 1.0):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there are too few samples"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return max(self.min_delay, ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))])
+
+
+class Cancellation:
+    """Lets one thread abort a request that another thread is running
+
+    The request registers the backend it was routed to, the socket it was sent on
+    and, once the server answers, its streamed response. cancel() shuts the socket
+    down, which makes Ollama drop the request and frees the connection even while
+    the server has not answered yet. Linked cancellations are cancelled along with
+    this one.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self._socket = None
+        self._response = None
+        self._linked = []
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def attach(self, response):
+        with self._lock:
+            self._response = response
+        if self.cancelled:
+            response.close()
+
+    def attach_socket(self, sock):
+        with self._lock:
+            self._socket = sock
+        if self.cancelled:
+            _shutdown(sock)
+
+    def detach(self):
+        """Forget a finished request's socket and response; its connection may be reused"""
+        with self._lock:
+            self._socket = None
+            self._response = None
+
+    def link(self, other: "Cancellation"):
+        """Cancel `other` whenever this one is cancelled"""
+        with self._lock:
+            self._linked.append(other)
+        if self.cancelled:
+            other.cancel()
+
+    def cancel(self):
+        self._event.set()
+        with self._lock:
+            # Under the lock, so detach() can hand the connection back without a race
+            if self._socket is not None:
+                _shutdown(self._socket)
+            response = self._response
+            linked = list(self._linked)
+        if response is not None:
+            response.close()
+        for other in linked:
+            other.cancel()
+
+
+def _shutdown(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+# Phases of one /api/generate call, from the response's *_duration fields (nanoseconds)
+PHASES = ("load", "prompt_eval", "eval", "total")
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        running = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            pairs.append(("+Inf" if bound == float("inf") else f"{bound:g}", running))
+        return pairs
+
+    def quantile(self, fraction: float) -> float:
+        """Upper bucket bound holding the given quantile (the last finite bound for +Inf)"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        for (bound, running), upper in zip(self.cumulative(), self.buckets + (self.buckets[-1],)):
+            if running >= target:
+                return float(upper)
+        return float(self.buckets[-1])
+
+
+class Totals:
+    """Summed timing fields of a group of calls (one section, chapter or the book)"""
+
+    __slots__ = ("calls", "cache_hits", "estimated", "hedged", "hedge_wins", "wall_seconds", "prompt_tokens",
+                 "eval_tokens", "load_seconds", "prompt_eval_seconds", "eval_seconds", "total_seconds")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def add(self, timing: Dict):
+        self.calls += 1
+        self.estimated += timing["estimated"]
+        self.hedged += timing["hedged"]
+        self.hedge_wins += timing["hedge_won"]
+        self.wall_seconds += timing["wall"]
+        self.prompt_tokens += timing["prompt_tokens"]
+        self.eval_tokens += timing["eval_tokens"]
+        self.load_seconds += timing["load"]
+        self.prompt_eval_seconds += timing["prompt_eval"]
+        self.eval_seconds += timing["eval"]
+        self.total_seconds += timing["total"]
+
+    def to_dict(self) -> Dict:
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["eval_tokens_per_second"] = self.eval_tokens / self.eval_seconds if self.eval_seconds else 0.0
+        data["prompt_tokens_per_second"] = (self.prompt_tokens / self.prompt_eval_seconds
+                                            if self.prompt_eval_seconds else 0.0)
+        # Where the server's time went
+        server = self.load_seconds + self.prompt_eval_seconds + self.eval_seconds
+        for phase in ("load", "prompt_eval", "eval"):
+            data[f"{phase}_share"] = getattr(self, f"{phase}_seconds") / server if server else 0.0
+        return data
+
+
+class InferenceMetrics:
+    """Per-call Ollama timings aggregated per section, chapter and book
+
+    record() takes the /api/generate result; its load_duration, prompt_eval_duration,
+    eval_duration and total_duration feed one latency histogram per phase, and the
+    token counts give prompt and decode throughput. Streams we hung up on carry no
+    final timing chunk, so the client estimates them (`estimated` counts those).
+    `hedged` counts calls that got a duplicate request, `hedge_wins` those the
+    duplicate answered first.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {phase: Histogram() for phase in PHASES + ("wall",)}
+        self.book = Totals()
+        self.chapters: Dict[Tuple[str, str], Totals] = {}
+        self.sections: Dict[Tuple[str, str, str], Totals] = {}
+
+    @staticmethod
+    def timing(result: Dict, wall_seconds: float) -> Dict:
+        """Seconds and token counts of one response"""
+        return {
+            "wall": wall_seconds,
+            "estimated": 1 if result.get("timing_estimated") else 0,
+            "hedged": 1 if result.get("hedged") else 0,
+            "hedge_won": 1 if result.get("hedge_won") else 0,
+            "prompt_tokens": result.get("prompt_eval_count", 0),
+            "eval_tokens": result.get("eval_count", 0),
+            "load": result.get("load_duration", 0) / 1e9,
+            "prompt_eval": result.get("prompt_eval_duration", 0) / 1e9,
+            "eval": result.get("eval_duration", 0) / 1e9,
+            "total": result.get("total_duration", 0) / 1e9 or wall_seconds
+        }
+
+    def record(self, result: Dict, wall_seconds: float, labels: Optional[Tuple[str, str, str]] = None):
+        """Add one finished call; labels are (part, chapter, section title)"""
+        timing = self.timing(result, wall_seconds)
+        with self._lock:
+            for phase in PHASES + ("wall",):
+                self.histograms[phase].observe(timing[phase])
+            self.book.add(timing)
+            if labels:
+                self.chapters.setdefault(labels[:2], Totals()).add(timing)
+                self.sections.setdefault(labels, Totals()).add(timing)
+
+    def record_cache_hit(self, labels: Optional[Tuple[str, str, str]] = None):
+        with self._lock:
+            self.book.cache_hits += 1
+            if labels:
+                self.chapters.setdefault(labels[:2], Totals()).cache_hits += 1
+                self.sections.setdefault(labels, Totals()).cache_hits += 1
+
+    def summary(self) -> Dict:
+        """JSON-ready view: book totals, latency quantiles and per chapter/section totals"""
+        with self._lock:
+            return {
+                "book": self.book.to_dict(),
+                "latency_seconds": {
+                    phase: {
+                        "count": histogram.count,
+                        "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                        "p50": histogram.quantile(0.5),
+                        "p90": histogram.quantile(0.9),
+                        "p99": histogram.quantile(0.99),
+                        "buckets": dict(histogram.cumulative())
+                    } for phase, histogram in self.histograms.items()
+                },
+                "chapters": [dict(part=part, chapter=chapter, **totals.to_dict())
+                             for (part, chapter), totals in self.chapters.items()],
+                "sections": [dict(part=part, chapter=chapter, section=section, **totals.to_dict())
+                             for (part, chapter, section), totals in self.sections.items()]
+            }
+
+    def to_prometheus(self, model: str = "") -> str:
+        """Prometheus text exposition format: histograms per phase, counters per chapter"""
+        def label_text(**labels) -> str:
+            pairs = []
+            for key, value in labels.items():
+                value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                pairs.append(f'{key}="{value}"')
+            return "{" + ",".join(pairs) + "}"
+
+        lines = [
+            "# HELP bookgen_request_duration_seconds Ollama /api/generate latency by phase",
+            "# TYPE bookgen_request_duration_seconds histogram"
+        ]
+        with self._lock:
+            for phase, histogram in self.histograms.items():
+                for bound, count in histogram.cumulative():
+                    lines.append(f"bookgen_request_duration_seconds_bucket"
+                                 f"{label_text(model=model, phase=phase, le=bound)} {count}")
+                lines.append(f"bookgen_request_duration_seconds_sum{label_text(model=model, phase=phase)} "
+                             f"{histogram.sum:.6f}")
+                lines.append(f"bookgen_request_duration_seconds_count{label_text(model=model, phase=phase)} "
+                             f"{histogram.count}")
+
+            counters = [
+                ("bookgen_requests_total", "Generate calls answered by the server", "calls"),
+                ("bookgen_cache_hits_total", "Generate calls answered from the response cache", "cache_hits"),
+                ("bookgen_hedged_requests_total", "Generate calls that got a duplicate request", "hedged"),
+                ("bookgen_hedge_wins_total", "Hedged calls answered by the duplicate", "hedge_wins"),
+                ("bookgen_prompt_tokens_total", "Prompt tokens evaluated", "prompt_tokens"),
+                ("bookgen_eval_tokens_total", "Tokens generated", "eval_tokens"),
+                ("bookgen_eval_seconds_total", "Seconds spent generating tokens", "eval_seconds"),
+                ("bookgen_prompt_eval_seconds_total", "Seconds spent evaluating prompts", "prompt_eval_seconds"),
+                ("bookgen_load_seconds_total", "Seconds spent loading the model", "load_seconds"),
+            ]
+            for name, help_text, field in counters:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for (part, chapter), totals in self.chapters.items():
+                    lines.append(f"{name}{label_text(model=model, part=part, chapter=chapter)} "
+                                 f"{getattr(totals, field):g}")
+
+            lines.append("# HELP bookgen_eval_tokens_per_second Decode throughput over the whole book")
+            lines.append("# TYPE bookgen_eval_tokens_per_second gauge")
+            lines.append(f"bookgen_eval_tokens_per_second{label_text(model=model)} "
+                         f"{self.book.to_dict()['eval_tokens_per_second']:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, prometheus_file: str, json_file: str, model: str = ""):
+        """Write both exports, each through a temp file renamed into place"""
+        for filename, text in ((prometheus_file, self.to_prometheus(model)),
+                               (json_file, json.dumps(dict(model=model, **self.summary()), indent=2))):
+            tmp_filename = f"{filename}.tmp"
+            with open(tmp_filename, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_filename, filename)
@@ -0,0 +1,114 @@
+import json
+import math
+import os
+import threading
+from typing import Dict, Optional
+
+from progress_journal import write_snapshot
+
+# Generators in one process (e.g. a batch) share the file, so saves take turns
+_save_lock = threading.Lock()
+
+
+class LengthController:
+    """Sizes num_predict from what a model has actually produced
+
+    Ollama stops after num_predict tokens, so the budget for a call is the words
+    still wanted divided by the model's observed words per token, times a headroom
+    factor. The headroom grows when a call runs out of tokens short of its word
+    target and slowly shrinks while calls finish, so over-generation stays small
+    while nearly every call completes in one go. What was learned is kept per model
+    in a JSON file and picked up by the next run.
+    """
+
+    def __init__(self, path: Optional[str] = "length_controller.json", model: str = "",
+                 words_per_token: float = 0.75, headroom: float = 1.3, min_headroom: float = 1.05,
+                 max_headroom: float = 2.5, smoothing: float = 0.1):
+        self.path = path
+        self.model = model
+        self.min_headroom = min_headroom
+        self.max_headroom = max_headroom
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+
+        self.words_per_token = words_per_token
+        self.headroom = headroom
+        self.calls = 0
+        self.completed = 0
+        self.budget_misses = 0  # Calls that hit num_predict short of their target
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def budget(self, words: int, cap: int) -> int:
+        """num_predict for a call that should produce about `words` words"""
+        with self._lock:
+            tokens = math.ceil(words / self.words_per_token * self.headroom)
+        return max(16, min(cap, tokens))
+
+    def observe(self, requested_words: Optional[int], result: Dict):
+        """Learn from one /api/generate result"""
+        if result.get("done_reason") == "interrupted":
+            return
+        words = len(result.get("response", "").split())
+        tokens = result.get("eval_count", 0)
+
+        with self._lock:
+            if words and tokens:
+                ratio = words / tokens
+                self.words_per_token += self.smoothing * (ratio - self.words_per_token)
+
+            if not requested_words:
+                return
+            self.calls += 1
+            # Hanging up means the stream reached its target
+            if result.get("stopped_early") or words >= requested_words * 0.9:
+                self.completed += 1
+                self.headroom -= (self.headroom - self.min_headroom) * self.smoothing / 2
+            elif result.get("done_reason") == "length":
+                self.budget_misses += 1
+                self.headroom = min(self.max_headroom, self.headroom * 1.15)
+            # A model that stopped on its own would not have used a bigger budget
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "model": self.model,
+                "words_per_token": self.words_per_token,
+                "headroom": self.headroom,
+                "calls": self.calls,
+                "completed": self.completed,
+                "budget_misses": self.budget_misses,
+                "completion_rate": self.completed / self.calls if self.calls else 0.0
+            }
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                learned = json.load(f).get(self.model)
+        except (OSError, ValueError):
+            return
+        if learned:
+            self.words_per_token = learned.get("words_per_token", self.words_per_token)
+            self.headroom = learned.get("headroom", self.headroom)
+            self.calls = learned.get("calls", 0)
+            self.completed = learned.get("completed", 0)
+            self.budget_misses = learned.get("budget_misses", 0)
+
+    def save(self):
+        """Store this model's numbers, keeping other models' entries in the file"""
+        if not self.path:
+            return
+        stats = self.stats()
+        del stats["model"], stats["completion_rate"]
+
+        with _save_lock:
+            models = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        models = json.load(f)
+                except (OSError, ValueError):
+                    models = {}
+            models[self.model] = stats
+            write_snapshot(self.path, models)
@@ -1,203 +1,104 @@
-import json
-import requests
 import time
 import os
+import asyncio
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional
-import hashlib
+from typing import Callable, Dict, List, Optional
+
+from backpressure import AimdController, queue_delay
+from book_exporter import BookExporter
+from book_renderer import IncrementalBookRenderer
+from context_buffer import ContextBuffer
+from hedging import Cancellation, LatencyTracker
+from inference_metrics import InferenceMetrics
+from length_controller import LengthController
+from near_duplicates import NearDuplicateIndex
+from model_profiles import ModelProfile, get_profile
+from ollama_client import OllamaClient, OllamaError
+from outline_catalog import open_catalog
+from postprocess import ChunkPostProcessor, clean_generated_content
+from parallel_engine import ChapterParallelEngine, PlanThenWriteEngine
+from progress_journal import ProgressJournal, write_snapshot
+from response_cache import ResponseCache
+from section_batches import SECTION_MARKER, split_batch_response
+from section_plans import PLAN_TOKENS_PER_SECTION, PROMPT_CHARS_PER_TOKEN, default_brief, known_terms, parse_briefs, render_brief
+from section_store import SectionStore
+from section_table import Section, SectionTable
 
 class BookGenerator:
-    def __init__(self, ollama_host="127.0.0.1:11434", model="llama3.1:8b"):
-        self.ollama_host = ollama_host
+    def __init__(self, ollama_host="127.0.0.1:11434", model="llama3.1:8b",
+                 cache_file="llm_response_cache.sqlite3", client: Optional[OllamaClient] = None,
+                 length_file="length_controller.json", profile: Optional[ModelProfile] = None,
+                 hedge_percentile: Optional[float] = None):
+        self.ollama_host = ollama_host  # One host, or several separated by commas
         self.model = model
-        self.base_url = f"http://{ollama_host}/api/generate"
+        # Per-model settings, including any calibration stored for this host
+        self.profile = profile or get_profile(model, ollama_host)
         
         # Book structure and memory
-        self.book_structure = {}
-        self.written_content = {}
-        self.content_hashes = set()  # To track duplicate content
+        self.sections = SectionTable()  # Outline and written content, addressed by integer section id
+        self.outlines = open_catalog()  # Outline templates, loaded on demand
+        self.content_index = NearDuplicateIndex(threshold=0.8)  # To track near-duplicate content
+        self.postprocessor = ChunkPostProcessor()  # Cleans and fingerprints chunks off the generation threads
+        self.briefs: Dict[int, Dict] = {}  # Section id -> plan written by plan_chapter()
+        self.partials: Dict[int, Dict] = {}  # Section id -> journalled chunks of a section not finished yet
         self.current_progress = {}
-        
-        # Configuration for 8B model (higher capacity)
+        self.journal = None  # Write-ahead journal of the book being generated
+        # Keep section bodies in a SQLite file next to the progress file and load them on demand,
+        # instead of holding the whole book in memory
+        self.store_sections = False
+        self.section_store: Optional[SectionStore] = None
+        self.context_buffer = ContextBuffer(max_chars=self.profile.context_chars)  # Recent tails only, never the whole book
+        self._local = threading.local()  # Per-thread flags such as cache hits
+        self.stopping = threading.Event()  # Set by stop(): no new calls, open streams are closed
+        self._cancellations = set()  # One per generate call in flight
+        self._cancellations_lock = threading.Lock()
+        self.metrics = InferenceMetrics()  # Ollama timing fields per section, chapter and book
+        
+        # Configuration
         self.words_per_page = 250  # Standard book page
         self.target_pages = 300
         self.target_words = self.words_per_page * self.target_pages
-        self.chunk_size = 1200  # Larger chunks for 8B model
-        self.max_context_length = 8192  # 8B model has larger context window
+        self.renderer = IncrementalBookRenderer(self.words_per_page)  # Caches rendered chapters between saves
+        self.export_formats = ()  # Extra formats written when the book is finished, e.g. ("html", "epub")
+        self.chunk_size = self.profile.chunk_size
+        self.max_context_length = self.profile.num_ctx  # None keeps the server's default
+        self.max_parallel_chapters = self.profile.max_parallel_chapters  # Match OLLAMA_NUM_PARALLEL on the server
+        self.stream = True  # Stream tokens and hang up once a section has enough words
+        self.generation_options = {}  # Per-job overrides of the sampling options below
+        # Consecutive sections of a chapter whose targets add up to at most this many words share
+        # one request; 0 writes every section on its own
+        self.batch_words = 0
+        self.max_batch_sections = 6
+        # Plan every section first, then write all sections independently from their briefs
+        self.plan_first = False
+        
+        # Identical model/options/prompt triples are answered from disk; set cache.bypass to force fresh calls
+        self.cache = ResponseCache(cache_file) if cache_file else None
+        
+        # Learns this model's words per token so num_predict fits the words a call should write
+        self.length_controller = LengthController(length_file, model=model)
+        
+        # Calls slower than this latency percentile get a duplicate request; None disables hedging
+        self.latency_tracker = LatencyTracker(hedge_percentile) if hedge_percentile else None
+        
+        # One keep-alive connection per parallel chapter, retried with backoff (or a client shared by a batch)
+        # Hedging can have two requests in flight per chapter
+        connections = self.max_parallel_chapters * (2 if self.latency_tracker else 1)
+        self.client = client or OllamaClient(ollama_host, pool_size=connections,
+                                             timeout=self.profile.timeout)
+        # Keep every backend as busy as a single server would be
+        self.max_parallel_chapters *= len(self.client.pool)
+        
+        # Paces generate calls and caps how many are in flight by how the server copes,
+        # instead of sleeping a fixed delay after every call
+        self.backpressure = AimdController(max_limit=self.max_parallel_chapters)
         
     def create_book_outline(self, topic: str) -> Dict:
         """Generate a comprehensive book outline for the given topic"""
         
-        # Predefined structure templates for different topics
-        structures = {
-            "data_science": {
-                "Part I: Foundations": {
-                    "Chapter 1: Introduction to Data Science": [
-                        "What is Data Science?",
-                        "History and Evolution",
-                        "Key Components and Skills",
-                        "Career Paths and Opportunities"
-                    ],
-                    "Chapter 2: Mathematics and Statistics Fundamentals": [
-                        "Descriptive Statistics",
-                        "Probability Theory",
-                        "Linear Algebra Basics",
-                        "Calculus for Data Science"
-                    ],
-                    "Chapter 3: Programming Foundations": [
-                        "Python for Data Science",
-                        "R Programming Basics",
-                        "SQL and Databases",
-                        "Version Control with Git"
-                    ]
-                },
-                "Part II: Data Collection and Preparation": {
-                    "Chapter 4: Data Collection Methods": [
-                        "Web Scraping Techniques",
-                        "APIs and Data Sources",
-                        "Survey Design",
-                        "Experimental Data Collection"
-                    ],
-                    "Chapter 5: Data Cleaning and Preprocessing": [
-                        "Handling Missing Data",
-                        "Outlier Detection and Treatment",
-                        "Data Transformation",
-                        "Feature Engineering"
-                    ],
-                    "Chapter 6: Exploratory Data Analysis": [
-                        "Data Visualization Principles",
-                        "Statistical Summaries",
-                        "Pattern Recognition",
-                        "Hypothesis Generation"
-                    ]
-                },
-                "Part III: Machine Learning and Analytics": {
-                    "Chapter 7: Supervised Learning": [
-                        "Linear and Logistic Regression",
-                        "Decision Trees and Random Forest",
-                        "Support Vector Machines",
-                        "Model Evaluation and Selection"
-                    ],
-                    "Chapter 8: Unsupervised Learning": [
-                        "Clustering Algorithms",
-                        "Dimensionality Reduction",
-                        "Association Rules",
-                        "Anomaly Detection"
-                    ],
-                    "Chapter 9: Deep Learning Fundamentals": [
-                        "Neural Network Basics",
-                        "Convolutional Neural Networks",
-                        "Recurrent Neural Networks",
-                        "Transfer Learning"
-                    ]
-                },
-                "Part IV: Advanced Topics and Applications": {
-                    "Chapter 10: Big Data Technologies": [
-                        "Hadoop and MapReduce",
-                        "Spark and Distributed Computing",
-                        "NoSQL Databases",
-                        "Cloud Computing Platforms"
-                    ],
-                    "Chapter 11: Specialized Applications": [
-                        "Natural Language Processing",
-                        "Computer Vision",
-                        "Time Series Analysis",
-                        "Recommender Systems"
-                    ],
-                    "Chapter 12: Ethics and Best Practices": [
-                        "Data Privacy and Security",
-                        "Bias in Machine Learning",
-                        "Reproducible Research",
-                        "Communication and Storytelling"
-                    ]
-                }
-            },
-            "default": {
-                "Part I: Introduction and Fundamentals": {
-                    f"Chapter 1: Introduction to {topic.title()}": [
-                        f"What is {topic.title()}?",
-                        "Historical Context",
-                        "Key Concepts and Terminology",
-                        "Current State and Trends"
-                    ],
-                    f"Chapter 2: Theoretical Foundations": [
-                        "Core Principles",
-                        "Fundamental Theories",
-                        "Research Methodologies",
-                        "Interdisciplinary Connections"
-                    ],
-                    f"Chapter 3: Essential Skills and Tools": [
-                        "Required Competencies",
-                        "Software and Technologies",
-                        "Best Practices",
-                        "Learning Resources"
-                    ]
-                },
-                "Part II: Core Concepts and Methods": {
-                    f"Chapter 4: Primary Methodologies": [
-                        "Approach 1: Traditional Methods",
-                        "Approach 2: Modern Techniques",
-                        "Comparative Analysis",
-                        "Selection Criteria"
-                    ],
-                    f"Chapter 5: Advanced Techniques": [
-                        "Cutting-edge Approaches",
-                        "Emerging Technologies",
-                        "Innovation Trends",
-                        "Future Directions"
-                    ],
-                    f"Chapter 6: Practical Implementation": [
-                        "Step-by-step Processes",
-                        "Common Challenges",
-                        "Solutions and Workarounds",
-                        "Quality Assurance"
-                    ]
-                },
-                "Part III: Applications and Case Studies": {
-                    f"Chapter 7: Real-world Applications": [
-                        "Industry Use Cases",
-                        "Success Stories",
-                        "Lessons Learned",
-                        "ROI and Impact Measurement"
-                    ],
-                    f"Chapter 8: Case Study Analysis": [
-                        "Detailed Case Study 1",
-                        "Detailed Case Study 2",
-                        "Comparative Analysis",
-                        "Key Takeaways"
-                    ],
-                    f"Chapter 9: Specialized Domains": [
-                        "Domain-specific Applications",
-                        "Customization Strategies",
-                        "Integration Challenges",
-                        "Domain Expertise Requirements"
-                    ]
-                },
-                "Part IV: Advanced Topics and Future": {
-                    f"Chapter 10: Current Challenges": [
-                        "Technical Limitations",
-                        "Scalability Issues",
-                        "Resource Constraints",
-                        "Solution Strategies"
-                    ],
-                    f"Chapter 11: Future Trends": [
-                        "Emerging Technologies",
-                        "Market Predictions",
-                        "Research Directions",
-                        "Potential Disruptions"
-                    ],
-                    f"Chapter 12: Conclusion and Next Steps": [
-                        "Summary of Key Points",
-                        "Actionable Recommendations",
-                        "Further Learning Paths",
-                        "Final Thoughts"
-                    ]
-                }
-            }
-        }
-        
-        # Select appropriate structure
-        structure = structures.get(topic.lower().replace(" ", "_"), structures["default"])
+        # Templates live in outlines/; only the one for this topic is ever parsed
+        structure = self.outlines.outline(topic)
         
         # Calculate word allocation
         total_sections = sum(len(sections) for part in structure.values() for sections in part.values())
@@ -215,59 +116,172 @@ class BookGenerator:
         
         return structure
     
-    def generate_content(self, prompt: str, max_tokens: int = 4096) -> str:
-        """Generate content using Ollama API (optimized for 8B model)"""
+    def generate_content(self, prompt: str, max_tokens: Optional[int] = None, stop_at_words: Optional[int] = None,
+                         on_text: Optional[Callable[[str], None]] = None,
+                         context: Optional[List[int]] = None, response_format: Optional[str] = None) -> str:
+        """Generate content using Ollama API
+        
+        In streaming mode text is passed to on_text as it arrives and the request is
+        closed once stop_at_words words have been produced. `context` continues the
+        conversation a previous call returned (see last_context), so the server only
+        evaluates the new prompt tokens. response_format="json" asks for a JSON answer.
+        """
+        max_tokens = max_tokens or self.profile.max_tokens
+        num_predict = max_tokens
+        if stop_at_words:
+            num_predict = self.length_controller.budget(stop_at_words, cap=max_tokens)
+        
         payload = {
             "model": self.model,
             "prompt": prompt,
             "stream": False,
-            "options": {
-                "temperature": 0.8,  # Slightly higher for more creativity
-                "top_p": 0.95,       # Higher for better quality
-                "top_k": 40,         # Add top-k sampling
-                "max_tokens": max_tokens,
-                "repeat_penalty": 1.1,  # Reduce repetition
-                "num_ctx": self.max_context_length  # Use full context window
-            }
+            "options": dict(self.profile.options, num_predict=num_predict)  # Sized by the length controller
         }
+        if self.max_context_length:
+            payload["options"]["num_ctx"] = self.max_context_length
+        payload["options"].update(self.generation_options)
+        if context:
+            payload["context"] = context
+        if response_format:
+            payload["format"] = response_format
+        
+        self._local.from_cache = False
+        self._local.context = None
+        cache_key = None
+        if self.cache:
+            # A streamed answer depends on where we hang up, so that is part of the key
+            # num_predict follows from stop_at_words and drifts as the controller learns, so the
+            # key records the words asked for instead of the token budget
+            options = {name: value for name, value in payload["options"].items() if name != "num_predict"}
+            cache_key = self.cache.make_key(self.model, options, prompt, stop_at_words=stop_at_words,
+                                            context=context, format=response_format)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._local.from_cache = True
+                self.metrics.record_cache_hit(getattr(self._local, "labels", None))
+                if on_text:
+                    on_text(cached)
+                return cached
+        
+        if self.stopping.is_set():
+            return ""
         
+        hedge_after = self.latency_tracker.delay() if self.latency_tracker else None
+        started = self.backpressure.acquire()
+        result = error = None
+        # Lets stop() hang up on this call; a plain (non-streamed) request runs to its end
+        cancel = Cancellation()
+        with self._cancellations_lock:
+            self._cancellations.add(cancel)
+        if self.stopping.is_set():
+            cancel.cancel()
         try:
-            response = requests.post(self.base_url, json=payload, timeout=1000)
-            response.raise_for_status()
+            if hedge_after is not None:
+                # Always streamed, so the losing request can be hung up on
+                result = self.client.generate_hedged(payload, hedge_after, on_text=on_text,
+                                                     stop_at_words=stop_at_words if self.stream else None,
+                                                     cancel=cancel)
+            elif self.stream:
+                result = self.client.generate_streaming(payload, stop_at_words=stop_at_words,
+                                                        on_text=on_text, cancel=cancel)
+            else:
+                result = self.client.generate(payload)
+            if cancel.cancelled:
+                # Whatever arrived before the hang-up is incomplete; keep it out of the cache
+                return ""
+            wall_seconds = time.monotonic() - started
+            if self.latency_tracker and "first_token_seconds" in result:
+                # Hedging races the start of a call, so it learns from time to first token
+                self.latency_tracker.observe(result["first_token_seconds"])
+            content = result.get("response", "").strip()
+            self.metrics.record(result, wall_seconds, getattr(self._local, "labels", None))
+            if not response_format:
+                # Structured answers have a different words-per-token ratio than prose
+                self.length_controller.observe(stop_at_words, result)
+            # Only a generation that ran to completion returns its context
+            self._local.context = result.get("context")
             
-            result = response.json()
-            return result.get("response", "").strip()
+            if cache_key and content and result.get("done_reason") != "interrupted":
+                self.cache.put(cache_key, content)
+            return content
             
-        except requests.exceptions.RequestException as e:
+        except OllamaError as e:
             print(f"Error generating content: {e}")
+            error = e
             return ""
+        
+        finally:
+            with self._cancellations_lock:
+                self._cancellations.discard(cancel)
+            self.release_backpressure(started, result, error, cancelled=cancel.cancelled)
+    
+    def stop(self):
+        """Wind down in-flight generation, e.g. on Ctrl-C
+
+        No new calls are made, open streams are closed and generate_section stops
+        between iterations. Chunks journalled so far are kept for the next resume.
+        """
+        self.stopping.set()
+        with self._cancellations_lock:
+            cancellations = list(self._cancellations)
+        for cancel in cancellations:
+            cancel.cancel()
+    
+    def release_backpressure(self, started: float, result: Optional[Dict], error: Optional[OllamaError] = None,
+                             cancelled: bool = False):
+        """Tell the backpressure controller how a generate call went"""
+        if cancelled or (result is None and not (error and error.transient)):
+            # Our own hang-ups and requests the server rejected say nothing about its load
+            self.backpressure.discard()
+            return
+        if result is None:
+            self.backpressure.release(started, failed=True)
+            return
+        
+        # Waiting to send a hedge is not queueing on the server
+        wall_seconds = time.monotonic() - started - result.get("hedge_delay", 0)
+        estimated = result.get("timing_estimated")
+        first_token = result.get("prompt_eval_duration", 0) / 1e9 if estimated else None
+        queued = queue_delay(result, wall_seconds, self.backpressure.first_token_floor)
+        # Retries mean the server answered 429/503 or dropped us, the clearest overload signal
+        self.backpressure.release(started, queued, failed=result.get("retries", 0) > 0, first_token=first_token)
+    
+    @property
+    def last_context(self) -> Optional[List[int]]:
+        """Context tokens returned by the last generate_content call in this thread, if any"""
+        return getattr(self._local, "context", None)
+    
+    @property
+    def served_from_cache(self) -> bool:
+        """Whether the last generate_content call in this thread was a cache hit"""
+        return getattr(self._local, "from_cache", False)
     
     def is_duplicate_content(self, content: str) -> bool:
-        """Check if content is duplicate using hash comparison"""
-        content_hash = hashlib.md5(content.lower().strip().encode()).hexdigest()
+        """Check if content nearly duplicates an earlier chunk using MinHash/LSH"""
+        return self.content_index.check_and_add(content)
+    
+    def create_context_prompt(self, topic: str, part: str, chapter: str, section: Section, 
+                            previous_content: str = "", brief: str = "") -> str:
+        """Create a context-aware prompt for content generation
         
-        if content_hash in self.content_hashes:
-            return True
+        With a brief from the planning pass, the brief replaces the look-back at the
+        previously written text.
+        """
         
-        self.content_hashes.add(content_hash)
-        return False
-    
-    def create_context_prompt(self, topic: str, part: str, chapter: str, section: Dict, 
-                            previous_content: str = "") -> str:
-        """Create a context-aware prompt for content generation (optimized for 8B model)"""
+        if self.profile.prompt_style == "compact":
+            return self.create_compact_prompt(topic, part, chapter, section, previous_content, brief)
         
-        # Use larger context window for 8B model
-        context_length = min(2000, len(previous_content))
+        # Larger models can use a long look-back
+        context_length = min(self.profile.context_chars, len(previous_content))
         context_info = f"""
-Previously written content summary:
-{previous_content[-context_length:] if previous_content else "This is the beginning of the book."}
+{self.lookback(previous_content[-context_length:], brief, section, chapter)}
 
 Book Structure Context:
 - Topic: {topic}
 - Current Part: {part}
 - Current Chapter: {chapter}
-- Current Section: {section['title']}
-- Target Words: {section['target_words']}
+- Current Section: {section.title}
+- Target Words: {section.target_words}
 
 Writing Guidelines:
 - Write in an authoritative, engaging academic style
@@ -283,10 +297,10 @@ You are an expert author writing a comprehensive, professional book about "{topi
 
 {context_info}
 
-Write the section "{section['title']}" for the chapter "{chapter}".
+Write the section "{section.title}" for the chapter "{chapter}".
 
 Requirements:
-- Write approximately {section['target_words']} words
+- Write approximately {section.target_words} words
 - Be thorough, detailed, and comprehensive
 - Include practical examples, code snippets, and real-world applications where relevant
 - Use proper academic structure with clear subsections
@@ -297,265 +311,590 @@ Requirements:
 - Do not repeat information already covered
 - End with a smooth transition to prepare for the next section
 
-Focus specifically on "{section['title']}" and provide in-depth coverage of this topic.
+Focus specifically on "{section.title}" and provide in-depth coverage of this topic.
+
+Section Content:
+"""
+        
+        return prompt
+    
+    def create_compact_prompt(self, topic: str, part: str, chapter: str, section: Section,
+                              previous_content: str = "", brief: str = "") -> str:
+        """Shorter prompt for small models such as Llama 3.2 1B"""
+        
+        context_info = f"""
+{self.lookback(previous_content[-self.profile.context_chars:], brief, section, chapter)}
+
+Book Structure Context:
+- Topic: {topic}
+- Current Part: {part}
+- Current Chapter: {chapter}
+- Current Section: {section.title}
+- Target Words: {section.target_words}
+"""
+        
+        prompt = f"""
+You are writing a comprehensive book about "{topic}". 
+
+{context_info}
+
+Write the section "{section.title}" for the chapter "{chapter}".
+
+Requirements:
+- Write approximately {section.target_words} words
+- Be detailed, informative, and engaging
+- Include practical examples and explanations
+- Maintain academic rigor while being accessible
+- Do not repeat information from previous sections
+- Focus specifically on "{section.title}"
+- Include relevant code examples if applicable
+- Structure with clear subsections and paragraphs
 
 Section Content:
 """
         
         return prompt
     
-    def generate_section(self, topic: str, part: str, chapter: str, section: Dict, 
-                        previous_content: str = "") -> str:
-        """Generate content for a specific section (optimized for 8B model)"""
+    def lookback(self, previous_content: str, brief: str, section: Section, chapter: str) -> str:
+        """What a section prompt is told about the rest of the book"""
+        if brief:
+            return f"Section plan:\n{brief}"
+        return f"Previously written content summary:\n{previous_content or self.opening_note(section, chapter)}"
+    
+    def opening_note(self, section: Section, chapter: str) -> str:
+        """Where a section sits when there is no earlier text to show, e.g. a chapter started in parallel"""
+        if section.chapter_id == 0 and section.index == 0:
+            return "This is the beginning of the book."
+        if section.index == 0:
+            return (f"This is the start of the chapter \"{chapter}\", chapter {section.chapter_id + 1} "
+                    f"of {len(self.sections.chapters)}.")
+        previous = self.sections.sections[section.id - 1]
+        return f"This section continues the chapter \"{chapter}\" after the section \"{previous.title}\"."
+    
+    def continuation_prompt(self, prompt: str, full_content: str, remaining_words: int,
+                            target_words: int, has_context: bool) -> str:
+        """Prompt for the next generation call of a section"""
+        compact = self.profile.prompt_style == "compact"
+        
+        if full_content and has_context:
+            # The server already holds the prompt and everything written so far
+            if compact:
+                return f"Continue from where you left off (need approximately {remaining_words} more words):"
+            return f"Continue writing to reach approximately {remaining_words} more words. Build upon the previous content and maintain coherent flow:"
+        
+        tail = full_content[-self.profile.continuation_chars:]
+        if compact:
+            chunk_prompt = prompt + f"\n\nContinue writing (need approximately {remaining_words} more words):\n"
+            if full_content:
+                chunk_prompt += f"\n\nPrevious content:\n{tail}\n\nContinue from where you left off:"
+            return chunk_prompt
         
-        prompt = self.create_context_prompt(topic, part, chapter, section, previous_content)
+        if full_content:
+            return prompt + f"\n\nPrevious content from this section:\n{tail}\n\nContinue writing to reach approximately {remaining_words} more words. Build upon the previous content and maintain coherent flow:"
+        return prompt + f"\n\nBegin writing the section (target: {target_words} words):"
+    
+    def generate_section(self, topic: str, part: str, chapter: str, section: Section, 
+                        previous_content: str = "", brief: str = "") -> str:
+        """Generate content for a specific section"""
+        
+        prompt = self.create_context_prompt(topic, part, chapter, section, previous_content, brief)
+        self._local.labels = (part, chapter, section.title)  # Metrics of the calls below
         
-        # 8B model can handle larger chunks, so generate in fewer iterations
+        # Larger models write a section in a few big calls, small ones keep going until it is long enough
+        profile = self.profile
         full_content = ""
         words_generated = 0
-        target_words = section['target_words']
-        max_iterations = 3  # Fewer iterations due to larger capacity
-        
-        for iteration in range(max_iterations):
-            remaining_words = target_words - words_generated
+        target_words = section.target_words
+        context = None  # Server-side context of the previous iteration
+        
+        # Chunks journalled before an interruption are kept; the section continues after them
+        partial = self.partials.get(section.id) if self.journal else None
+        if partial:
+            full_content = "\n\n".join(partial["chunks"])
+            words_generated = partial["word_count"]
+            print(f"    ↩️  Resuming after chunk {len(partial['chunks'])} ({words_generated}/{target_words} words)")
+            if words_generated >= target_words * profile.completion_ratio:
+                return full_content
+        first_iteration = len(partial["chunks"]) if partial else 0
+        
+        def accept(pending: Dict) -> bool:
+            """Take in a chunk once its post-processing is done; False if it added nothing new"""
+            nonlocal full_content, words_generated
+            processed = self.postprocessor.collect(pending["future"], pending["text"], profile.clean_output,
+                                                   self.content_index)
+            iteration = pending["iteration"]
+            # A cache hit replays a chunk we may already have indexed, so it is never a duplicate
+            if self.content_index.check_and_add_signature(processed["signature"]) and not pending["from_cache"]:
+                print(f"    ⚠️  Iteration {iteration + 1}: No new content generated")
+                return False
             
-            if remaining_words <= 100:  # Close enough to target
-                break
-                
-            chunk_prompt = prompt
+            chunk_content = processed["content"]
+            full_content += "\n\n" + chunk_content if full_content else chunk_content
+            words_generated += processed["word_count"]
             
-            if full_content:
-                # Use larger context window for continuation
-                context_window = min(1500, len(full_content))
-                chunk_prompt += f"\n\nPrevious content from this section:\n{full_content[-context_window:]}\n\nContinue writing to reach approximately {remaining_words} more words. Build upon the previous content and maintain coherent flow:"
-            else:
-                chunk_prompt += f"\n\nBegin writing the section (target: {target_words} words):"
+            self.record_chunk(section, iteration, chunk_content, words_generated)
             
-            # Generate larger chunks with 8B model
-            chunk_content = self.generate_content(chunk_prompt, max_tokens=min(4096, remaining_words * 3))
+            print(f"    📝 Iteration {iteration + 1}: {processed['word_count']} words generated ({words_generated}/{target_words} total)")
+            if processed["repetition"] > 0.3:
+                print(f"    🔁 Iteration {iteration + 1}: {processed['repetition']:.0%} of sentences repeat")
+            return True
+        
+        # Each chunk is cleaned and fingerprinted in the pool while the next one is generated;
+        # until then its raw word count stands in for the cleaned one
+        pending = None
+        for iteration in range(first_iteration, profile.max_iterations):
+            if self.stopping.is_set():
+                break
+            written = full_content
+            pending_words = 0
+            if pending:
+                written = written + "\n\n" + pending["text"] if written else pending["text"]
+                pending_words = len(pending["text"].split())
+            remaining_words = target_words - words_generated - pending_words
             
-            if not chunk_content or self.is_duplicate_content(chunk_content):
-                print(f"    ⚠️  Iteration {iteration + 1}: No new content generated")
+            if remaining_words <= profile.min_remaining_words:  # Close enough to target
                 break
             
-            # Clean up the generated content
-            chunk_content = self.clean_generated_content(chunk_content)
+            chunk_prompt = self.continuation_prompt(prompt, written, remaining_words, target_words,
+                                                    has_context=bool(context))
             
-            full_content += "\n\n" + chunk_content if full_content else chunk_content
-            words_generated = len(full_content.split())
+            # The token budget is sized for remaining_words
+            chunk_content = self.generate_content(chunk_prompt, stop_at_words=remaining_words, context=context)
+            context = self.last_context
+            if self.stopping.is_set():
+                # The engine has given up on this section; only journalled chunks count
+                break
             
-            print(f"    📝 Iteration {iteration + 1}: {len(chunk_content.split())} words generated ({words_generated}/{target_words} total)")
+            if pending:
+                accepted, pending = accept(pending), None
+                if not accepted:
+                    break
+            if not chunk_content:
+                print(f"    ⚠️  Iteration {iteration + 1}: No new content generated")
+                break
             
-            # Smaller delay for 8B model (it's more efficient)
-            time.sleep(0.5)
+            pending = {"future": self.postprocessor.submit(chunk_content, profile.clean_output, self.content_index),
+                       "text": chunk_content, "iteration": iteration, "from_cache": self.served_from_cache}
             
             # Check if we've reached a good stopping point
-            if words_generated >= target_words * 0.9:  # 90% of target is acceptable
+            if words_generated + len(chunk_content.split()) >= target_words * profile.completion_ratio:
                 break
         
+        if pending:
+            accept(pending)
+        
         return full_content
     
-    def clean_generated_content(self, content: str) -> str:
-        """Clean and format generated content"""
-        # Remove common artifacts from generation
-        content = content.strip()
+    def create_plan_prompt(self, topic: str, chapter_id: int, introduced: List[str],
+                           sections: Optional[List[Section]] = None) -> str:
+        """Prompt asking for a JSON brief of every section of one chapter, or of `sections` of it"""
+        
+        outline = "\n".join(
+            f"- {chapter.part} / {chapter.title}: "
+            + ", ".join(section.title for section in self.sections.chapter_sections(chapter))
+            for chapter in self.sections.chapters)
+        
+        chapter = self.sections.chapters[chapter_id]
+        sections = sections or self.sections.chapter_sections(chapter)
+        listing = "\n".join(f"{section.index + 1}. {section.title}" for section in sections)
+        
+        prompt = f"""
+You are planning a comprehensive book about "{topic}". The full outline is:
+{outline}
+
+Terms already introduced earlier in the book: {", ".join(introduced) or "none"}
+
+Plan the sections of the chapter "{chapter.title}":
+{listing}
+
+For every section, in order, give 2 to 5 key points, the new terms it introduces, how it
+connects to the section before it and how it leads into the next one. Answer with JSON only:
+{{"sections": [{{"title": "...", "key_points": ["..."], "terms": ["..."], "transition_in": "...", "transition_out": "..."}}]}}
+"""
+        
+        return prompt
+    
+    def plan_chapter(self, topic: str, chapter_id: int) -> Dict[int, Dict]:
+        """Planning pass for one chapter: store and journal a brief per section"""
+        
+        chapter = self.sections.chapters[chapter_id]
+        sections = self.sections.chapter_sections(chapter)
+        self._local.labels = (chapter.part, chapter.title, "plan")
+        
+        # The answer has to fit next to the prompt; a long chapter is planned a few sections at a time
+        full_prompt = self.create_plan_prompt(topic, chapter_id, known_terms(self.briefs, sections[0]))
+        budget = self.plan_token_budget(full_prompt)
+        per_call = budget // PLAN_TOKENS_PER_SECTION
+        groups = [sections[start:start + per_call] for start in range(0, len(sections), per_call)] if per_call else []
+        if not groups:
+            print(f"  ⚠️  No room to plan {chapter.title} in a {self.max_context_length}-token context; "
+                  f"following the outline")
+        
+        briefs = {section.id: default_brief(self.sections, section) for section in sections}
+        for group in groups:
+            introduced = known_terms({**self.briefs, **briefs}, group[0])
+            prompt = self.create_plan_prompt(topic, chapter_id, introduced,
+                                             group if len(group) < len(sections) else None)
+            # No word target: hanging up mid-JSON would lose the whole plan, so the answer runs to its end
+            response = self.generate_content(prompt, max_tokens=PLAN_TOKENS_PER_SECTION * len(group),
+                                             response_format="json")
+            if self.stopping.is_set():
+                # A cut-off plan must not be journalled, or the resume would not plan this chapter again
+                return {}
+            briefs.update(parse_briefs(response, group, self.sections))
+        self.briefs.update(briefs)
+        
+        planned = sum(1 for brief in briefs.values() if brief["planned"])
+        print(f"  🗺️  Planned {chapter.title}: {planned}/{len(sections)} briefs"
+              + ("" if planned == len(sections) else " (the rest follow the outline)"))
+        
+        if self.journal:
+            self.journal.append({"op": "plan", "briefs": {str(section_id): brief for section_id, brief in briefs.items()}})
+        return briefs
+    
+    def plan_token_budget(self, prompt: str) -> int:
+        """Most tokens a planning answer can have: the profile's cap, less the prompt's share of num_ctx"""
+        budget = self.profile.max_tokens
+        if self.max_context_length:
+            budget = min(budget, self.max_context_length - len(prompt) // PROMPT_CHARS_PER_TOKEN)
+        return max(0, budget)
+    
+    def section_brief(self, section: Section) -> str:
+        """Prompt text of a section's brief, with the terms earlier sections introduced"""
+        brief = self.briefs.get(section.id) or default_brief(self.sections, section)
+        return render_brief(brief, known_terms(self.briefs, section))
+    
+    def create_batch_prompt(self, topic: str, part: str, chapter: str, sections: List[Section],
+                            previous_content: str = "") -> str:
+        """One prompt for several consecutive sections, each introduced by a marker line"""
         
-        # Remove repetitive phrases that might occur
-        lines = content.split('\n')
-        cleaned_lines = []
-        prev_line = ""
+        listing = "\n".join(f"{number}. {section.title} (approximately {section.target_words} words)"
+                            for number, section in enumerate(sections, 1))
+        markers = "\n".join(SECTION_MARKER.format(number=number, title=section.title)
+                            for number, section in enumerate(sections, 1))
+        context_length = min(self.profile.context_chars, len(previous_content))
         
-        for line in lines:
-            line = line.strip()
-            if line and line != prev_line:  # Remove duplicate consecutive lines
-                cleaned_lines.append(line)
-                prev_line = line
-            elif line:  # Keep empty lines for formatting
-                cleaned_lines.append(line)
+        guidelines = ""
+        if self.profile.prompt_style != "compact":
+            guidelines = """
+Writing Guidelines:
+- Write in an authoritative, engaging academic style
+- Include specific examples, case studies, and practical applications
+- Use proper headings and subheadings for organization
+- Maintain consistency with the overall book narrative
+"""
+        
+        prompt = f"""
+You are an expert author writing a comprehensive, professional book about "{topic}".
+
+Previously written content summary:
+{previous_content[-context_length:] or self.opening_note(sections[0], chapter)}
+
+Book Structure Context:
+- Topic: {topic}
+- Current Part: {part}
+- Current Chapter: {chapter}
+{guidelines}
+Write the following {len(sections)} consecutive sections of the chapter "{chapter}":
+{listing}
+
+Requirements:
+- Start every section with its marker line, exactly as shown and on a line of its own:
+{markers}
+- Write nothing before the first marker
+- Give each section approximately its target word count
+- Include practical examples and explanations
+- Do not repeat information between sections or from previous sections
+
+Sections:
+"""
         
-        return '\n'.join(cleaned_lines)
+        return prompt
     
-    def save_progress(self, filename: str):
-        """Save current progress to file"""
+    def generate_batch(self, topic: str, part: str, chapter: str, sections: List[Section],
+                       previous_content: str = "") -> List[Optional[str]]:
+        """Write several short sections with one request
+        
+        Returns one entry per section. None marks a section whose part of the answer was
+        missing, too short or a near duplicate; it should be written on its own instead.
+        """
+        
+        prompt = self.create_batch_prompt(topic, part, chapter, sections, previous_content)
+        self._local.labels = (part, chapter, " + ".join(section.title for section in sections))
+        
+        response = self.generate_content(prompt, stop_at_words=sum(section.target_words for section in sections))
+        
+        # Every body goes to the pool before the first result is waited on
+        bodies = split_batch_response(response, sections)
+        futures = [self.postprocessor.submit(body, self.profile.clean_output, self.content_index)
+                   if body is not None else None for body in bodies]
+        contents = []
+        for body, future in zip(bodies, futures):
+            if body is not None:
+                processed = self.postprocessor.collect(future, body, self.profile.clean_output, self.content_index)
+                if self.content_index.check_and_add_signature(processed["signature"]) and not self.served_from_cache:
+                    body = None
+                else:
+                    body = processed["content"]
+            contents.append(body)
+        
+        missing = contents.count(None)
+        print(f"    📦 Batch of {len(sections)} sections: {len(sections) - missing} parsed"
+              + (f", {missing} left for single calls" if missing else ""))
+        
+        return contents
+    
+    def clean_generated_content(self, content: str) -> str:
+        """Clean and format generated content"""
+        return clean_generated_content(content)
+    
+    def record_chunk(self, section: Section, iteration: int, content: str, word_count: int):
+        """Journal one accepted chunk of a section still being written, so a resume can continue it"""
+        if not self.journal:
+            return
+        
+        with self.journal.lock:
+            partial = self.partials.setdefault(section.id, {"chunks": [], "word_count": 0})
+            partial["chunks"].append(content)
+            partial["word_count"] = word_count
+            self.journal.append({
+                "op": "chunk",
+                "id": section.id,
+                "iteration": iteration,
+                "content": content,
+                "word_count": word_count,
+                "content_index": self.content_index.drain_new()
+            })
+    
+    def record_section(self, section: Section, content: str):
+        """Store a finished section in the section table"""
+        self.sections.write(section.id, content, timestamp=datetime.now().isoformat())
+        self.partials.pop(section.id, None)
+        
+        # One small journal line per section instead of rewriting the whole book
+        if self.journal:
+            self.journal.append({
+                "op": "section",
+                "id": section.id,
+                "word_count": section.word_count,
+                "timestamp": section.timestamp,
+                "content": content,
+                "content_index": self.content_index.drain_new()
+            })
+    
+    def apply_journal_record(self, record: Dict):
+        """Replay one progress journal record on top of the loaded snapshot"""
+        if record.get("op") == "section":
+            # Journals written before the section table name sections by "part|chapter|idx"
+            section_id = record["id"] if "id" in record else self.sections.id_of_key(record["key"])
+            entry = record.get("entry", record)
+            if section_id is not None and section_id < len(self.sections):
+                self.sections.write(section_id, entry["content"], entry.get("word_count"),
+                                    entry.get("timestamp", ""))
+                self.partials.pop(section_id, None)
+        elif record.get("op") == "chunk":
+            section_id = record["id"]
+            partial = self.partials.setdefault(section_id, {"chunks": [], "word_count": 0})
+            # A record replayed on top of a snapshot that already holds it is skipped
+            if record["iteration"] == len(partial["chunks"]) and not self.sections.sections[section_id].written:
+                partial["chunks"].append(record["content"])
+                partial["word_count"] = record["word_count"]
+            elif not partial["chunks"]:
+                del self.partials[section_id]
+        elif record.get("op") == "plan":
+            self.briefs.update({int(section_id): brief for section_id, brief in record["briefs"].items()})
+        if record.get("content_index"):
+            self.content_index.load_encoded(record["content_index"])
+    
+    @staticmethod
+    def section_store_path(progress_file: str) -> str:
+        return f"{os.path.splitext(progress_file)[0]}.sections.sqlite3"
+    
+    def open_section_store(self, path: str) -> SectionStore:
+        """Open the body store at path, reusing it if it is already open"""
+        if self.section_store is not None and os.path.abspath(self.section_store.path) == os.path.abspath(path):
+            return self.section_store
+        self.close_section_store()
+        self.section_store = SectionStore(path)
+        return self.section_store
+    
+    def close_section_store(self):
+        if self.section_store is not None:
+            self.section_store.close()
+            self.section_store = None
+    
+    def close(self):
+        """Release the generator's files and worker processes; a shared client stays open"""
+        self.close_section_store()
+        if self.cache:
+            self.cache.close()
+        self.postprocessor.close()
+    
+    def section_bodies(self, progress_file: str, stored_as: Optional[str] = None):
+        """Body mapping for a book: the snapshot's store if it names one, a new store if
+        store_sections is set, otherwise None for the table's in-memory dict"""
+        if stored_as:
+            return self.open_section_store(os.path.join(os.path.dirname(progress_file), stored_as))
+        if self.store_sections:
+            return self.open_section_store(self.section_store_path(progress_file))
+        return None
+    
+    def progress_snapshot(self) -> Dict:
         progress_data = {
-            "book_structure": self.book_structure,
-            "written_content": self.written_content,
+            "sections": self.sections.to_dict(),
+            "briefs": {str(section_id): brief for section_id, brief in self.briefs.items()},
+            "partials": {str(section_id): {"chunks": list(partial["chunks"]), "word_count": partial["word_count"]}
+                         for section_id, partial in self.partials.items()},
             "current_progress": self.current_progress,
-            "content_hashes": list(self.content_hashes),
+            "content_index": self.content_index.to_dict(mark_saved=True),
             "timestamp": datetime.now().isoformat()
         }
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(progress_data, f, indent=2, ensure_ascii=False)
+        if getattr(self.sections.bodies, "persistent", False):
+            progress_data["section_store"] = os.path.basename(self.sections.bodies.path)
+        return progress_data
+    
+    def save_progress(self, filename: str):
+        """Save a full progress snapshot (compacting the journal when it belongs to this file)"""
+        if self.journal and self.journal.snapshot_path == filename:
+            # Sections still being written journal their chunks from worker threads meanwhile
+            with self.journal.lock:
+                self.journal.compact(self.progress_snapshot())
+        else:
+            write_snapshot(filename, self.progress_snapshot())
     
     def load_progress(self, filename: str):
-        """Load previous progress from file"""
-        if os.path.exists(filename):
-            with open(filename, 'r', encoding='utf-8') as f:
-                progress_data = json.load(f)
-                
-            self.book_structure = progress_data.get("book_structure", {})
-            self.written_content = progress_data.get("written_content", {})
+        """Load previous progress: the last snapshot plus the journal written after it"""
+        progress_data, records = ProgressJournal.read(filename)
+        
+        if progress_data is not None or records:
+            progress_data = progress_data or {}
+            # Bodies already in the snapshot are moved into the store when store_sections is set
+            bodies = self.section_bodies(filename, progress_data.get("section_store"))
+            if "sections" in progress_data:
+                self.sections = SectionTable.from_dict(progress_data["sections"], bodies)
+            else:
+                # Older progress files: nested outline dict plus "part|chapter|idx" keyed content
+                self.sections = SectionTable.from_legacy(progress_data.get("book_structure", {}),
+                                                         progress_data.get("written_content", {}), bodies)
             self.current_progress = progress_data.get("current_progress", {})
-            self.content_hashes = set(progress_data.get("content_hashes", []))
+            self.briefs = {int(section_id): brief for section_id, brief in progress_data.get("briefs", {}).items()}
+            self.partials = {int(section_id): partial
+                             for section_id, partial in progress_data.get("partials", {}).items()}
+            
+            if "content_index" in progress_data:
+                self.content_index = NearDuplicateIndex.from_dict(progress_data["content_index"])
+            else:
+                # Older files only kept exact MD5 digests; re-index the chunks we still have
+                self.content_index = NearDuplicateIndex(threshold=self.content_index.threshold)
+                for section in self.sections.written():
+                    for chunk in section.content.split("\n\n"):
+                        self.content_index.add(chunk)
+            
+            for record in records:
+                self.apply_journal_record(record)
             
-            print(f"Progress loaded from {filename}")
+            # Resumed sections continue from what was already written
+            self.context_buffer.rebuild(self.sections)
+            
+            print(f"Progress loaded from {filename} ({len(records)} journal records replayed)")
             return True
         return False
     
-    def generate_book(self, topic: str, resume: bool = True):
+    def generate_book(self, topic: str, resume: bool = True, output_dir: str = "."):
         """Generate the complete book"""
         
-        progress_file = f"{topic.lower().replace(' ', '_')}_book_progress.json"
-        output_file = f"{topic.lower().replace(' ', '_')}_book.md"
+        progress_file = os.path.join(output_dir, f"{topic.lower().replace(' ', '_')}_book_progress.json")
+        output_file = os.path.join(output_dir, f"{topic.lower().replace(' ', '_')}_book.md")
+        metrics_file = os.path.join(output_dir, f"{topic.lower().replace(' ', '_')}_metrics")
+        
+        self.stopping.clear()  # A generator stopped by an earlier interrupt can run again
         
         # Load previous progress if resuming
+        self.journal = ProgressJournal(progress_file)
         if resume:
             self.load_progress(progress_file)
+        else:
+            self.journal.reset()
         
         # Create or load book structure
-        if not self.book_structure:
+        if not self.sections:
             print(f"Creating book outline for '{topic}'...")
-            self.book_structure = self.create_book_outline(topic)
+            bodies = self.section_bodies(progress_file)
+            if bodies is not None:
+                bodies.clear()  # Left over from an earlier book in the same place
+            self.sections = SectionTable.from_outline(self.create_book_outline(topic), bodies)
+            self.briefs = {}
+            self.partials = {}
             print("Book outline created!")
         
         print(f"\nGenerating book: '{topic.title()}'")
         print(f"Target: {self.target_pages} pages ({self.target_words} words)")
         print("=" * 60)
         
-        total_sections = sum(len(sections) for part in self.book_structure.values() 
-                           for sections in part.values())
-        completed_sections = 0
+        if self.plan_first:
+            print(f"Planning every chapter, then writing up to {self.max_parallel_chapters} sections in parallel")
+        else:
+            print(f"Writing up to {self.max_parallel_chapters} chapters in parallel")
         
-        # Generate content section by section
-        previous_content = ""
+        # Start from a consistent snapshot; after this every finished section is journalled
+        self.save_progress(progress_file)
         
-        for part_name, chapters in self.book_structure.items():
-            print(f"\n📚 {part_name}")
+        try:
+            # Each chapter is its own context chain, so independent chapters can run concurrently;
+            # with a plan every section is independent
+            engine_class = PlanThenWriteEngine if self.plan_first else ChapterParallelEngine
+            engine = engine_class(self, max_concurrency=self.max_parallel_chapters)
+            asyncio.run(engine.run(topic, progress_file, output_file))
             
-            for chapter_name, sections in chapters.items():
-                print(f"  📖 {chapter_name}")
-                
-                for section_idx, section in enumerate(sections):
-                    section_key = f"{part_name}|{chapter_name}|{section_idx}"
-                    
-                    # Skip if already completed
-                    if section_key in self.written_content:
-                        print(f"    ✓ {section['title']} (already completed)")
-                        completed_sections += 1
-                        continue
-                    
-                    print(f"    ⏳ Writing: {section['title']}")
-                    
-                    # Generate section content
-                    content = self.generate_section(topic, part_name, chapter_name, 
-                                                  section, previous_content)
-                    
-                    if content:
-                        self.written_content[section_key] = {
-                            "title": section['title'],
-                            "content": content,
-                            "word_count": len(content.split()),
-                            "timestamp": datetime.now().isoformat()
-                        }
-                        
-                        previous_content += f"\n\n{content}"
-                        completed_sections += 1
-                        
-                        print(f"    ✅ Completed: {len(content.split())} words")
-                    else:
-                        print(f"    ❌ Failed to generate content")
-                    
-                    # Save progress periodically
-                    if completed_sections % 5 == 0:
-                        self.save_progress(progress_file)
-                        self.save_book_to_file(topic, output_file)
-                    
-                    # Progress update
-                    progress = (completed_sections / total_sections) * 100
-                    print(f"    Progress: {completed_sections}/{total_sections} ({progress:.1f}%)")
-        
-        # Final save
-        self.save_progress(progress_file)
-        self.save_book_to_file(topic, output_file)
+            # Final save
+            self.save_progress(progress_file)
+            self.save_book_to_file(topic, output_file)
+            if self.export_formats:
+                self.export_book(topic, output_file[:-len(".md")], self.export_formats)
+        finally:
+            self.journal.close()
+            # Prometheus text for scraping plus a JSON summary, also when a run is interrupted
+            self.metrics.write(f"{metrics_file}.prom", f"{metrics_file}.json", model=self.model)
+            self.length_controller.save()
+            self.postprocessor.close()
         
         print(f"\n🎉 Book generation completed!")
         print(f"📄 Book saved as: {output_file}")
         print(f"💾 Progress saved as: {progress_file}")
+        print(f"📈 Metrics saved as: {metrics_file}.prom / {metrics_file}.json")
         
         return output_file
     
     def save_book_to_file(self, topic: str, filename: str):
-        """Save the complete book to a markdown file"""
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            # Title page
-            f.write(f"# {topic.title()}: A Comprehensive Guide\n\n")
-            f.write(f"*Generated on {datetime.now().strftime('%B %d, %Y')}*\n\n")
-            f.write("---\n\n")
-            
-            # Table of contents
-            f.write("## Table of Contents\n\n")
-            for part_name, chapters in self.book_structure.items():
-                f.write(f"### {part_name}\n")
-                for chapter_name, sections in chapters.items():
-                    f.write(f"- {chapter_name}\n")
-                    for section in sections:
-                        f.write(f"  - {section['title']}\n")
-                f.write("\n")
-            
-            f.write("---\n\n")
-            
-            # Book content
-            total_words = 0
-            
-            for part_name, chapters in self.book_structure.items():
-                f.write(f"# {part_name}\n\n")
-                
-                for chapter_name, sections in chapters.items():
-                    f.write(f"## {chapter_name}\n\n")
-                    
-                    for section_idx, section in enumerate(sections):
-                        section_key = f"{part_name}|{chapter_name}|{section_idx}"
-                        
-                        f.write(f"### {section['title']}\n\n")
-                        
-                        if section_key in self.written_content:
-                            content = self.written_content[section_key]['content']
-                            f.write(f"{content}\n\n")
-                            total_words += len(content.split())
-                        else:
-                            f.write("*[Content pending generation]*\n\n")
-                    
-                    f.write("---\n\n")
-            
-            # Statistics
-            f.write(f"\n## Book Statistics\n\n")
-            f.write(f"- **Total Words**: {total_words:,}\n")
-            f.write(f"- **Estimated Pages**: {total_words // self.words_per_page}\n")
-            f.write(f"- **Completion**: {len(self.written_content)} sections\n")
-            f.write(f"- **Generated**: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}\n")
+        """Save the complete book to a markdown file, re-rendering only changed chapters"""
+        self.renderer.words_per_page = self.words_per_page
+        self.renderer.render(topic, filename, self.sections)
+
+    def export_book(self, topic: str, basename: str, formats=("html", "epub")) -> Dict[str, str]:
+        """Write the book in other formats in a single pass, e.g. basename.html and basename.epub"""
+        exporter = BookExporter(tuple(formats), words_per_page=self.words_per_page)
+        paths = exporter.export(topic, self.sections, basename)
+        for fmt, path in paths.items():
+            print(f"📄 Exported {fmt}: {path}")
+        return paths
 
 # Usage example and main execution
-def main():
+def main(topic: str = "Data Science", model: str = "llama3.1:8b"):
     """Main function to demonstrate usage"""
     
-    # Initialize the book generator for Llama 3.1 8B
+    # Initialize the book generator; settings come from the model's profile
     generator = BookGenerator(
         ollama_host="127.0.0.1:11434", 
-        model="llama3.1:8b"
+        model=model
     )
     
-    # Example usage
-    topic = "Data Science"  # Change this to any topic you want
-    
-    print("🤖 AI Book Generator (Llama 3.1 8B Optimized)")
+    print(f"🤖 AI Book Generator ({generator.profile.label} Optimized)")
     print("=" * 60)
     print(f"Ollama Host: {generator.ollama_host}")
     print(f"Model: {generator.model}")
     print(f"Topic: {topic}")
     print(f"Target: {generator.target_pages} pages")
-    print(f"Context Window: {generator.max_context_length} tokens")
+    print(f"Context Window: {generator.max_context_length or 'server default'} tokens")
     print(f"Chunk Size: {generator.chunk_size} words")
     
     try:
@@ -565,20 +904,38 @@ def main():
         print(f"\n✅ Success! Book saved as: {output_file}")
         
         # Display final statistics
-        total_words = sum(content['word_count'] for content in generator.written_content.values())
+        total_words = generator.sections.total_words
         estimated_pages = total_words // generator.words_per_page
         
         print(f"\n📊 Final Statistics:")
         print(f"   Words: {total_words:,}")
         print(f"   Pages: {estimated_pages}")
-        print(f"   Sections: {len(generator.written_content)}")
-        print(f"   Model: Llama 3.1 8B")
+        print(f"   Sections: {generator.sections.written_count}")
+        
+        retry_stats = generator.client.stats()
+        print(f"   Requests: {retry_stats['requests']} ({retry_stats['retried_requests']} retried, {retry_stats['failed_requests']} failed)")
+        
+        lengths = generator.length_controller.stats()
+        print(f"   Length control: {lengths['words_per_token']:.2f} words/token, {lengths['completion_rate']:.0%} of calls reached their target")
+        
+        book_metrics = generator.metrics.summary()["book"]
+        print(f"   Decode: {book_metrics['eval_tokens_per_second']:.1f} tokens/s, prompt eval: {book_metrics['prompt_tokens_per_second']:.1f} tokens/s")
+        print(f"   Server time: {book_metrics['load_share']:.0%} loading, {book_metrics['prompt_eval_share']:.0%} prompt eval, {book_metrics['eval_share']:.0%} decoding")
+        
+        for backend in generator.client.backend_report():
+            status = "healthy" if backend['healthy'] else "ejected"
+            print(f"   Backend {backend['host']}: {backend['requests']} requests, {backend['tokens_per_second']:.1f} tokens/s ({status})")
+        
+        if generator.cache:
+            cache_stats = generator.cache.stats()
+            print(f"   Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%})")
+        print(f"   Model: {generator.profile.label}")
         
     except KeyboardInterrupt:
         print("\n⏸️  Generation paused. Resume by running the script again.")
     except Exception as e:
         print(f"\n❌ Error: {e}")
-        print("💡 Make sure Ollama is running and llama3.1:8b model is available")
+        print(f"💡 Make sure Ollama is running and {generator.model} model is available")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
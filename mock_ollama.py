@@ -0,0 +1,247 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+_VOCABULARY = (
+    "data model system analysis process method result value approach structure network "
+    "practice example research performance design pattern framework quality insight "
+    "algorithm feature measure theory application resource strategy context signal"
+).split()
+
+
+class MockOllamaServer:
+    """Local Ollama-compatible stand-in for benchmarks
+
+    Serves /api/generate (streaming and not), /api/version and /api/tags. Each
+    request waits a log-normally distributed startup latency, evaluates the prompt
+    at prompt_tokens_per_second and then decodes at a jittered tokens_per_second.
+    Only `parallel` requests are served at once, like OLLAMA_NUM_PARALLEL; the rest
+    queue. A stall_probability share of requests first hangs for stall_seconds,
+    holding its slot, to give the latency a long tail. Responses carry the same
+    timing fields as the real server.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.05,
+                 latency_sigma: float = 0.5, tokens_per_second: float = 200.0,
+                 tokens_per_second_jitter: float = 0.2, prompt_tokens_per_second: float = 4000.0,
+                 default_tokens: int = 600, parallel: int = 4, stall_probability: float = 0.0,
+                 stall_seconds: float = 10.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.tokens_per_second_jitter = tokens_per_second_jitter
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.default_tokens = default_tokens
+        self.stall_probability = stall_probability  # Share of requests that hang before answering
+        self.stall_seconds = stall_seconds
+
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._slots = threading.Semaphore(parallel)
+
+        self.request_log: List[Dict] = []  # One entry per finished generate call
+        self._log_lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self) -> "MockOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _plan(self, request: Dict) -> Dict:
+        """Decide latency, speed and output length for one request"""
+        options = request.get("options", {})
+        limit = options.get("num_predict")
+        if limit is None or limit < 0:
+            limit = 1 << 30
+
+        with self._rng_lock:
+            startup = self.latency * self._rng.lognormvariate(0, self.latency_sigma)
+            speed = max(1.0, self._rng.gauss(self.tokens_per_second,
+                                             self.tokens_per_second * self.tokens_per_second_jitter))
+            # How long the model would write if left alone; num_predict may cut it short
+            natural = int(self.default_tokens * self._rng.uniform(0.7, 1.3))
+            if self.stall_probability and self._rng.random() < self.stall_probability:
+                startup += self.stall_seconds
+            seed = self._rng.getrandbits(32)
+
+        # Tokens of a passed-in context are already evaluated; only the new prompt costs time
+        prompt_tokens = int(len(request.get("prompt", "").split()) * 1.3)
+        return {
+            "startup": startup,
+            "context_tokens": len(request.get("context") or []),
+            "prompt_tokens": prompt_tokens,
+            "prompt_seconds": prompt_tokens / self.prompt_tokens_per_second,
+            "tokens": min(limit, natural),
+            "done_reason": "length" if natural >= limit else "stop",
+            "seconds_per_token": 1.0 / speed,
+            "seed": seed
+        }
+
+    @staticmethod
+    def _tokens(count: int, seed: int):
+        """Word-piece-like tokens: roughly 1.3 tokens per word, sentences of ~15 words"""
+        rng = random.Random(seed)
+        produced = 0
+        words = 0
+        while produced < count:
+            word = rng.choice(_VOCABULARY)
+            words += 1
+            if words % 15 == 0:
+                word += "."
+            pieces = [word[:4], word[4:]] if len(word) > 6 and rng.random() < 0.3 else [word]
+            for index, piece in enumerate(pieces):
+                if produced >= count:
+                    return
+                yield (" " if index == 0 and produced else "") + piece
+                produced += 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Like Ollama's Go server; otherwise back-to-back keep-alive calls wait on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    # A client that cancelled a request resets its keep-alive connection
+                    self.close_connection = True
+
+            def _send_json(self, data: Dict, status: int = 200):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_chunk(self, data: Dict):
+                line = (json.dumps(data) + "\n").encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-mock"})
+                elif self.path == "/api/tags":
+                    self._send_json({"models": []})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self._send_json({"error": "not found"}, 404)
+                    return
+
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                plan = server._plan(request)
+                received = time.monotonic()
+
+                with server._slots:
+                    started = time.monotonic()
+                    time.sleep(plan["startup"] + plan["prompt_seconds"])
+                    decode_started = time.monotonic()
+
+                    if request.get("stream", True):
+                        produced = self._stream(request, plan, received, decode_started)
+                    else:
+                        time.sleep(plan["tokens"] * plan["seconds_per_token"])
+                        text = "".join(server._tokens(plan["tokens"], plan["seed"]))
+                        produced = plan["tokens"]
+                        self._send_json(self._final(request, plan, produced, received, decode_started, text))
+
+                with server._log_lock:
+                    server.request_log.append({
+                        "queued_seconds": started - received,
+                        "service_seconds": time.monotonic() - started,
+                        "tokens": produced,
+                        "prompt_tokens": plan["prompt_tokens"]
+                    })
+
+            def _final(self, request: Dict, plan: Dict, produced: int, received: float,
+                       decode_started: float, text: str = "") -> Dict:
+                now = time.monotonic()
+                return {
+                    "model": request.get("model"),
+                    "response": text,
+                    "done": True,
+                    "done_reason": plan["done_reason"],
+                    "context": list(range(plan["context_tokens"] + plan["prompt_tokens"] + produced)),
+                    "total_duration": int((now - received) * 1e9),
+                    "load_duration": int(plan["startup"] * 1e9),
+                    "prompt_eval_count": plan["prompt_tokens"],
+                    "prompt_eval_duration": int(plan["prompt_seconds"] * 1e9),
+                    "eval_count": produced,
+                    "eval_duration": int((now - decode_started) * 1e9)
+                }
+
+            def _stream(self, request: Dict, plan: Dict, received: float, decode_started: float) -> int:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                produced = 0
+                try:
+                    for token in server._tokens(plan["tokens"], plan["seed"]):
+                        time.sleep(plan["seconds_per_token"])
+                        self._send_chunk({"model": request.get("model"), "response": token, "done": False})
+                        produced += 1
+                    self._send_chunk(self._final(request, plan, produced, received, decode_started))
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client hung up; a real server stops decoding here too
+                    self.close_connection = True
+                return produced
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock Ollama server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.05, help="Median startup latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--parallel", type=int, default=4, help="Requests served at once")
+    args = parser.parse_args()
+
+    server = MockOllamaServer(port=args.port, latency=args.latency,
+                              tokens_per_second=args.tokens_per_second, parallel=args.parallel)
+    print(f"Mock Ollama listening on {server.address}")
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
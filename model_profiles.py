@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from ollama_client import OllamaClient, OllamaError
+from progress_journal import write_snapshot
+
+CALIBRATION_FILE = "model_profiles.json"
+
+# Settings calibrate() may override for a model on a given host
+CALIBRATED_FIELDS = ("num_ctx", "max_tokens", "max_parallel_chapters")
+
+
+class ModelProfile:
+    """Everything BookGenerator tunes per model
+
+    num_ctx, max_tokens (the num_predict cap per call) and max_parallel_chapters
+    are hardware dependent and can be measured with `python model_profiles.py
+    calibrate`; the rest describes how much prompt a model can make use of.
+    """
+
+    def __init__(self, model: str, label: str, options: Dict, num_ctx: Optional[int] = None,
+                 max_tokens: int = 4096, max_parallel_chapters: int = 4, timeout: float = 1000,
+                 chunk_size: int = 1200, context_chars: int = 2000, continuation_chars: int = 1500,
+                 max_iterations: int = 3, min_remaining_words: int = 100, completion_ratio: float = 0.9,
+                 prompt_style: str = "detailed", clean_output: bool = True):
+        self.model = model
+        self.label = label
+        self.options = options  # Sampling options sent with every request
+        self.num_ctx = num_ctx  # None leaves the server's default context window
+        self.max_tokens = max_tokens
+        self.max_parallel_chapters = max_parallel_chapters  # Match OLLAMA_NUM_PARALLEL on the server
+        self.timeout = timeout
+        self.chunk_size = chunk_size  # Words per generation chunk
+        self.context_chars = context_chars  # Previously written text shown in each prompt
+        self.continuation_chars = continuation_chars  # Section text re-sent when no context is kept
+        self.max_iterations = max_iterations  # Generation calls per section
+        self.min_remaining_words = min_remaining_words  # Stop once this close to the target
+        self.completion_ratio = completion_ratio  # Fraction of the target that counts as done
+        self.prompt_style = prompt_style  # "detailed" or "compact"
+        self.clean_output = clean_output
+        self.calibration = None  # Measurements this profile's tuned fields came from
+
+    def copy(self, **changes) -> "ModelProfile":
+        profile = ModelProfile.__new__(ModelProfile)
+        profile.__dict__.update(self.__dict__, options=dict(self.options))
+        profile.__dict__.update(changes)
+        return profile
+
+
+PROFILES: Dict[str, ModelProfile] = {}
+
+
+def register_profile(profile: ModelProfile):
+    PROFILES[profile.model] = profile
+
+
+register_profile(ModelProfile(
+    "llama3.1:8b", "Llama 3.1 8B",
+    options={
+        "temperature": 0.8,  # Slightly higher for more creativity
+        "top_p": 0.95,       # Higher for better quality
+        "top_k": 40,         # Add top-k sampling
+        "repeat_penalty": 1.1  # Reduce repetition
+    },
+    num_ctx=8192, max_tokens=4096, timeout=1000, chunk_size=1200,
+    context_chars=2000, continuation_chars=1500, max_iterations=3,
+    min_remaining_words=100, completion_ratio=0.9,
+    prompt_style="detailed", clean_output=True
+))
+
+# Small models get short prompts and keep writing until the section is long enough
+register_profile(ModelProfile(
+    "llama3.2:1b", "Llama 3.2 1B",
+    options={"temperature": 0.7, "top_p": 0.9},
+    num_ctx=None, max_tokens=2000, timeout=120, chunk_size=500,
+    context_chars=500, continuation_chars=300, max_iterations=10,
+    min_remaining_words=0, completion_ratio=1.0,
+    prompt_style="compact", clean_output=False
+))
+
+
+def calibration_key(model: str, host) -> str:
+    hosts = host if isinstance(host, str) else ",".join(host)
+    return f"{model}@{hosts}"
+
+
+def get_profile(model: str, host=None, calibration_file: Optional[str] = CALIBRATION_FILE) -> ModelProfile:
+    """Profile for a model, with any calibration stored for it on this host applied
+
+    Unknown tags fall back to a registered profile of the same family ("llama3.1:8b-q4"
+    uses "llama3.1:8b"), and otherwise to the 8B profile.
+    """
+    base = PROFILES.get(model)
+    if base is None:
+        family = [name for name in PROFILES if model.startswith(name)]
+        base = PROFILES[max(family, key=len)] if family else PROFILES["llama3.1:8b"]
+    profile = base.copy(model=model)
+
+    if host and calibration_file and os.path.exists(calibration_file):
+        try:
+            with open(calibration_file, 'r', encoding='utf-8') as f:
+                measured = json.load(f).get(calibration_key(model, host))
+        except (OSError, ValueError):
+            measured = None
+        if measured:
+            for field in CALIBRATED_FIELDS:
+                if field in measured:
+                    setattr(profile, field, measured[field])
+            profile.calibration = measured
+    return profile
+
+
+PROBE_PROMPT = ("Write a detailed, well structured section of a technical book about how computer "
+                "networks move data, with examples. Write at least {words} words.")
+
+
+def probe(client: OllamaClient, model: str, options: Dict, num_ctx: Optional[int], max_tokens: int,
+          concurrency: int, rounds: int = 3) -> Dict:
+    """Keep `concurrency` identical requests in flight for `rounds` rounds and measure words/sec"""
+    payload_options = dict(options, num_predict=max_tokens)
+    if num_ctx:
+        payload_options["num_ctx"] = num_ctx
+    payload = {
+        "model": model,
+        "prompt": PROBE_PROMPT.format(words=int(max_tokens * 0.75)),
+        "stream": False,
+        "options": payload_options
+    }
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: client.generate(payload), range(concurrency * rounds)))
+    elapsed = time.monotonic() - started
+
+    words = sum(len(result.get("response", "").split()) for result in results)
+    return {
+        "num_ctx": num_ctx,
+        "max_tokens": max_tokens,
+        "max_parallel_chapters": concurrency,
+        "words": words,
+        "seconds": elapsed,
+        "words_per_second": words / elapsed if elapsed else 0.0
+    }
+
+
+def calibrate(model: str, host: str = "127.0.0.1:11434",
+              concurrency_levels: List[int] = (1, 2, 4, 8),
+              context_sizes: List[int] = (2048, 4096, 8192),
+              lengths: List[int] = (512, 1024, 2048, 4096)) -> Dict:
+    """Find the num_ctx, generation length and concurrency with the best words/sec
+
+    One setting is swept at a time, keeping the best value of the previous sweeps:
+    concurrency first (it matters most), then generation length, then the context
+    window among the sizes that can hold that length.
+    """
+    profile = get_profile(model, calibration_file=None)
+    client = OllamaClient(host, pool_size=max(concurrency_levels), max_retries=1, timeout=profile.timeout)
+    best = {"num_ctx": profile.num_ctx, "max_tokens": min(profile.max_tokens, 1024),
+            "max_parallel_chapters": 1}
+    probes = []
+    measured = {}  # Probe of the settings currently in `best`
+
+    def sweep(field: str, values):
+        nonlocal best, measured
+        results = []
+        for value in values:
+            settings = dict(best, **{field: value})
+            # The window has to hold the prompt and everything generated
+            if settings["num_ctx"] and settings["num_ctx"] < settings["max_tokens"] + 256:
+                continue
+            try:
+                result = probe(client, model, profile.options, settings["num_ctx"], settings["max_tokens"],
+                               settings["max_parallel_chapters"])
+            except OllamaError as e:
+                print(f"   ❌ {field}={value}: {e}")
+                continue
+            print(f"   {field}={value}: {result['words_per_second']:.1f} words/s")
+            results.append(result)
+        probes.extend(results)
+        if results:
+            measured = max(results, key=lambda result: result["words_per_second"])
+            best = {name: measured[name] for name in CALIBRATED_FIELDS}
+
+    # Warm up so the first probe does not pay for loading the model
+    probe(client, model, profile.options, best["num_ctx"], 16, 1, rounds=1)
+
+    print(f"🔧 Calibrating {model} on {host}")
+    sweep("max_parallel_chapters", concurrency_levels)
+    sweep("max_tokens", lengths)
+    sweep("num_ctx", context_sizes)
+    client.close()
+
+    return dict(best, words_per_second=measured.get("words_per_second", 0.0),
+                calibrated=datetime.now().isoformat(), probes=len(probes))
+
+
+def save_calibration(model: str, host, result: Dict, calibration_file: str = CALIBRATION_FILE):
+    calibrations = {}
+    if os.path.exists(calibration_file):
+        with open(calibration_file, 'r', encoding='utf-8') as f:
+            calibrations = json.load(f)
+    calibrations[calibration_key(model, host)] = result
+    write_snapshot(calibration_file, calibrations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model profiles for the book generator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="Show the registered profiles")
+
+    calibrate_parser = commands.add_parser("calibrate", help="Probe a server and store the fastest settings")
+    calibrate_parser.add_argument("--model", default="llama3.1:8b")
+    calibrate_parser.add_argument("--host", default="127.0.0.1:11434")
+    calibrate_parser.add_argument("--file", default=CALIBRATION_FILE, help="Where calibrations are stored")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name, profile in PROFILES.items():
+            print(f"{name}: {profile.label}, num_ctx={profile.num_ctx}, max_tokens={profile.max_tokens}, "
+                  f"{profile.max_parallel_chapters} parallel chapters, {profile.prompt_style} prompts")
+        return
+
+    result = calibrate(args.model, args.host)
+    save_calibration(args.model, args.host, result, args.file)
+    print(f"\n✅ {args.model} on {args.host}: num_ctx={result['num_ctx']}, max_tokens={result['max_tokens']}, "
+          f"{result['max_parallel_chapters']} parallel chapters ({result['words_per_second']:.1f} words/s)")
+    print(f"💾 Saved to {args.file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import base64
+import hashlib
+import random
+import re
+import sys
+import threading
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=8)
+def _permutations(num_perm: int, seed: int) -> Tuple[Tuple[int, int], ...]:
+    # Fixed seed, so signatures stay comparable across runs and processes
+    rng = random.Random(seed)
+    return tuple((rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(num_perm))
+
+
+def minhash_signature(text: str, num_perm: int = 64, shingle_size: int = 5, seed: int = 1) -> Optional[array]:
+    """MinHash signature of the text's word shingles, or None for empty text
+
+    A plain function so post-processing workers can compute signatures without an index.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return None
+
+    k = shingle_size
+    shingles = {" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+              for shingle in shingles]
+
+    return array("I", (min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+                       for a, b in _permutations(num_perm, seed)))
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index of generated chunks that flags near-identical text
+
+    Each chunk is reduced to a MinHash signature over word shingles. Signatures are
+    split into LSH bands, so a lookup only compares against chunks that share at
+    least one band instead of scanning the whole book.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+
+        self.signatures: List[array] = []
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._saved = 0  # Signatures already covered by a snapshot or journal record
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def signature(self, text: str) -> Optional[array]:
+        """MinHash signature of the text's word shingles, or None for empty text"""
+        return minhash_signature(text, self.num_perm, self.shingle_size, self.seed)
+
+    def similarity(self, first: array, second: array) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for x, y in zip(first, second) if x == y) / self.num_perm
+
+    def _band_keys(self, signature: array) -> Iterable:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def _best_match(self, signature: array) -> float:
+        best = 0.0
+        seen = set()
+        for band, key in self._band_keys(signature):
+            for doc_id in self._buckets[band].get(key, ()):
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    best = max(best, self.similarity(signature, self.signatures[doc_id]))
+        return best
+
+    def _add(self, signature: array):
+        doc_id = len(self.signatures)
+        self.signatures.append(signature)
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, []).append(doc_id)
+
+    def is_near_duplicate(self, text: str) -> bool:
+        """Whether text is at least `threshold` similar to an indexed chunk"""
+        signature = self.signature(text)
+        if signature is None:
+            return False
+        with self._lock:
+            return self._best_match(signature) >= self.threshold
+
+    def check_and_add(self, text: str) -> bool:
+        """Return True for a near duplicate; otherwise index the text and return False"""
+        return self.check_and_add_signature(self.signature(text))
+
+    def check_and_add_signature(self, signature: Optional[array]) -> bool:
+        """check_and_add() for a signature computed elsewhere, e.g. in a worker process"""
+        if signature is None:
+            return False
+
+        with self._lock:
+            if self._best_match(signature) >= self.threshold:
+                return True
+            self._add(signature)
+        return False
+
+    def add(self, text: str):
+        signature = self.signature(text)
+        if signature is not None:
+            with self._lock:
+                self._add(signature)
+
+    @staticmethod
+    def _encode(signatures: List[array]) -> str:
+        blob = array("I")
+        for signature in signatures:
+            blob.extend(signature)
+        if sys.byteorder == "big":
+            blob.byteswap()
+        return base64.b64encode(blob.tobytes()).decode("ascii")
+
+    def _decode(self, encoded: str) -> List[array]:
+        blob = array("I")
+        blob.frombytes(base64.b64decode(encoded))
+        if sys.byteorder == "big":
+            blob.byteswap()
+        return [blob[start:start + self.num_perm] for start in range(0, len(blob), self.num_perm)]
+
+    def drain_new(self) -> str:
+        """Encode the signatures added since the last drain or snapshot, for a journal record"""
+        with self._lock:
+            new = self.signatures[self._saved:]
+            self._saved = len(self.signatures)
+        return self._encode(new)
+
+    def load_encoded(self, encoded: str):
+        """Add signatures produced by drain_new()"""
+        with self._lock:
+            for signature in self._decode(encoded):
+                self._add(signature)
+            self._saved = len(self.signatures)
+
+    def to_dict(self, mark_saved: bool = False) -> Dict:
+        """Compact form for the progress file: all signatures as one base64 blob"""
+        with self._lock:
+            signatures = list(self.signatures)
+            if mark_saved:
+                self._saved = len(signatures)
+
+        return {
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "shingle_size": self.shingle_size,
+            "seed": self.seed,
+            "signatures": self._encode(signatures)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "NearDuplicateIndex":
+        index = cls(threshold=data.get("threshold", 0.8), num_perm=data["num_perm"],
+                    bands=data["bands"], shingle_size=data["shingle_size"], seed=data["seed"])
+
+        index.load_encoded(data.get("signatures", ""))
+        return index
@@ -0,0 +1,445 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+
+from backend_pool import Backend, BackendPool
+from hedging import Cancellation
+
+# Responses worth retrying: overload, gateway hiccups and model (re)loading
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class OllamaError(Exception):
+    """Raised when an Ollama request fails for good
+
+    `transient` is set when the server was overloaded or dropped us, as opposed to
+    rejecting the request or the request being cancelled.
+    """
+
+    def __init__(self, message: str, retries: int = 0, transient: bool = False):
+        super().__init__(message)
+        self.retries = retries
+        self.transient = transient
+
+
+class TransientResponseError(requests.exceptions.HTTPError):
+    """HTTP status that is expected to succeed on a later attempt"""
+
+
+# The Cancellation of the request being sent from this thread, if any
+_sending = threading.local()
+
+
+class _SocketRegistering:
+    """Hands the socket a request went out on to the sending thread's Cancellation
+
+    Ollama only answers once the first token is ready, so until then there is no
+    response to close; shutting the socket down is the only way to give up.
+    """
+
+    def request(self, *args, **kwargs):
+        super().request(*args, **kwargs)
+        cancel = getattr(_sending, "cancel", None)
+        if cancel is not None and self.sock is not None:
+            cancel.attach_socket(self.sock)
+
+
+class _CancellableHTTPConnection(_SocketRegistering, HTTPConnection):
+    pass
+
+
+class _CancellableHTTPSConnection(_SocketRegistering, HTTPSConnection):
+    pass
+
+
+class _CancellableHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _CancellableHTTPConnection
+
+
+class _CancellableHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _CancellableHTTPSConnection
+
+
+class CancellableAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections can be dropped by a Cancellation mid-request"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _CancellableHTTPPool,
+                                                   "https": _CancellableHTTPSPool}
+
+
+class OllamaClient:
+    """Keep-alive, pooled HTTP client for the Ollama API with retry and backoff
+
+    ollama_host may name several instances ("host1:11434,host2:11434" or a list);
+    requests are then load balanced across them by a health-checked BackendPool.
+    """
+
+    def __init__(self, ollama_host: Union[str, Iterable[str]] = "127.0.0.1:11434", pool_size: int = 4,
+                 max_retries: int = 4, backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 timeout: float = 1000, probe_interval: float = 15.0):
+        self.ollama_host = ollama_host
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.pool = BackendPool(ollama_host, probe_interval=probe_interval)
+        if len(self.pool) > 1:
+            self.pool.start_health_checks()
+
+        # One session keeps connections alive between calls; pool_block bounds each host's pool
+        self.session = requests.Session()
+        adapter = CancellableAdapter(pool_connections=len(self.pool), pool_maxsize=max(1, pool_size),
+                                     pool_block=True, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Retry accounting
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+        self.retry_counts = Counter()  # retries needed -> number of successful requests
+        self.failed_requests = 0
+        self.total_retries = 0
+        self.hedged_requests = 0  # Requests that were slow enough to get a duplicate
+        self.hedge_wins = 0  # ...and were answered by the duplicate first
+
+    @property
+    def last_retries(self) -> int:
+        """Retries needed by the last request made from the calling thread"""
+        return getattr(self._local, "retries", 0)
+
+    def generate(self, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        """POST to /api/generate, retrying transient failures with jittered backoff
+
+        The result carries the number of retries it needed as "retries".
+        """
+        result, _ = self._post("/api/generate", payload, timeout, stream=False)
+        result["retries"] = self.last_retries
+        return result
+
+    def stream_generate(self, payload: Dict, timeout: Optional[float] = None,
+                        cancel: Optional[Cancellation] = None, exclude: Iterable[Backend] = ()) -> Iterator[Dict]:
+        """Yield the NDJSON chunks of a streaming /api/generate call
+
+        Closing the iterator early drops the connection, which makes Ollama stop
+        generating. Only the initial connection is retried: once tokens have been
+        handed to the caller a failure is raised as OllamaError. A cancelled stream
+        just ends.
+        """
+        response, backend = self._post("/api/generate", dict(payload, stream=True), timeout, stream=True,
+                                       cancel=cancel, exclude=exclude)
+        if cancel is not None:
+            cancel.attach(response)
+        started = time.monotonic()
+        eval_tokens = 0
+        ok = False
+        try:
+            for line in response.iter_lines():
+                if cancel is not None and cancel.cancelled:
+                    break
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise OllamaError(chunk["error"])
+                # Hanging up early is not the backend's fault
+                ok = True
+                eval_tokens = chunk.get("eval_count", eval_tokens)
+                yield chunk
+                if chunk.get("done"):
+                    break
+        except (requests.exceptions.RequestException, ValueError, AttributeError) as e:
+            # Closing the response under a reader can surface as any of these
+            if cancel is not None and cancel.cancelled:
+                return
+            ok = False
+            raise OllamaError(f"Stream interrupted: {e}", transient=True) from e
+        except OllamaError:
+            ok = False
+            raise
+        finally:
+            if cancel is not None:
+                cancel.detach()
+            response.close()
+            # Being cancelled is not the backend's fault either
+            ok = ok or (cancel is not None and cancel.cancelled)
+            self.pool.release(backend, ok, time.monotonic() - started, eval_tokens)
+
+    def generate_streaming(self, payload: Dict, stop_at_words: Optional[int] = None,
+                           on_text: Optional[Callable[[str], None]] = None,
+                           grace: float = 0.1, timeout: Optional[float] = None,
+                           cancel: Optional[Cancellation] = None, exclude: Iterable[Backend] = ()) -> Dict:
+        """Stream a generation, optionally hanging up once enough words have arrived
+
+        After stop_at_words the stream is kept open only until the current sentence
+        ends, or until `grace` times the target in extra words, whichever is first.
+        Returns the same shape as generate(), "retries" included, with "stopped_early"
+        and, once a token arrived, "first_token_seconds" added. A stream we hang up on never gets the final timing chunk; its timings
+        are then estimated from when the tokens arrived and "timing_estimated" is set.
+        """
+        pieces = []
+        words = 0
+        in_word = False
+        result = {"done": False, "stopped_early": False}
+        hard_limit = None if stop_at_words is None else int(stop_at_words * (1 + grace))
+
+        started = time.monotonic()
+        first_token_at = last_token_at = None
+        stream = self.stream_generate(payload, timeout, cancel=cancel, exclude=exclude)
+        try:
+            for chunk in stream:
+                piece = chunk.get("response", "")
+                if chunk.get("done"):
+                    result.update(chunk)
+                if not piece:
+                    continue
+
+                last_token_at = time.monotonic()
+                if first_token_at is None:
+                    first_token_at = last_token_at
+                pieces.append(piece)
+                if on_text:
+                    on_text(piece)
+
+                # Count word starts incrementally; tokens often split words
+                for char in piece:
+                    if char.isspace():
+                        in_word = False
+                    elif not in_word:
+                        in_word = True
+                        words += 1
+
+                if stop_at_words is not None and words >= stop_at_words:
+                    if piece.rstrip().endswith((".", "!", "?")) or words >= hard_limit:
+                        result["stopped_early"] = True
+                        break
+        except OllamaError as e:
+            if not pieces:
+                raise
+            print(f"    ⚠️  Keeping {words} words from an interrupted stream: {e}")
+            result["done_reason"] = "interrupted"
+        finally:
+            stream.close()
+
+        # The stream connected in this thread, so its retries are this thread's last ones
+        result["retries"] = self.last_retries
+        result["response"] = "".join(pieces)
+        if pieces:
+            result["first_token_seconds"] = first_token_at - started
+        if "eval_count" not in result and pieces:
+            # Time to first token covers loading and prompt evaluation; one chunk is one token
+            result.update({
+                "timing_estimated": True,
+                "prompt_eval_duration": int((first_token_at - started) * 1e9),
+                "eval_count": len(pieces),
+                "eval_duration": int((last_token_at - first_token_at) * 1e9),
+                "total_duration": int((last_token_at - started) * 1e9)
+            })
+        return result
+
+    def generate_hedged(self, payload: Dict, hedge_after: float, stop_at_words: Optional[int] = None,
+                        on_text: Optional[Callable[[str], None]] = None,
+                        timeout: Optional[float] = None, cancel: Optional[Cancellation] = None) -> Dict:
+        """Streamed generation that races a duplicate request against a slow one
+
+        If no token has come back after hedge_after seconds, the same request is sent
+        again, to another backend when there is one and otherwise to another slot of
+        the same server. The first request to produce a token wins and the other is
+        cancelled there and then, so only the start of a generation is ever duplicated.
+        on_text gets the winner's text in one piece. The result is shaped like
+        generate_streaming()'s, with "hedged" and "hedge_won" added and
+        "first_token_seconds" counted from this call. "hedge_delay" is how long after
+        this call the winning request was sent. Each attempt runs in its own
+        thread, so "retries" adds up the winner's and failed attempts' retries.
+        Cancelling `cancel` cancels every attempt.
+        """
+        started = time.monotonic()
+        attempts: Dict[Future, Cancellation] = {}
+        offsets: Dict[Future, float] = {}  # When each attempt was sent, from the start of this call
+        claimed = Future()  # Resolves to the attempt that produced the first token
+        lock = threading.Lock()
+
+        def claim(future: Future):
+            with lock:
+                if claimed.done():
+                    return
+                claimed.set_result(future)
+                losers = [other for attempt, other in attempts.items() if attempt is not future]
+            for other in losers:
+                other.cancel()
+
+        def start(exclude: Iterable[Backend] = ()) -> Future:
+            # Plain daemon threads: a request stuck on the server must not hold up a pool
+            future = Future()
+            attempt_cancel = Cancellation()
+            if cancel is not None:
+                cancel.link(attempt_cancel)
+            with lock:
+                attempts[future] = attempt_cancel
+                offsets[future] = time.monotonic() - started
+
+            def run():
+                try:
+                    future.set_result(self.generate_streaming(payload, stop_at_words=stop_at_words,
+                                                              on_text=lambda piece: claim(future),
+                                                              timeout=timeout, cancel=attempt_cancel,
+                                                              exclude=exclude))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            threading.Thread(target=run, name="ollama-hedge", daemon=True).start()
+            return future
+
+        primary = start()
+        if not wait([primary, claimed], timeout=hedge_after, return_when=FIRST_COMPLETED).done:
+            backend = attempts[primary].backend
+            start(exclude=[backend] if backend else ())
+
+        # Until a token arrives, an attempt that fails leaves the race to the other
+        pending = set(attempts)
+        while pending and not claimed.done():
+            _, pending = wait(pending | {claimed}, return_when=FIRST_COMPLETED)
+            pending.discard(claimed)
+
+        if claimed.done():
+            winner = claimed.result()
+        else:
+            # Nobody produced a token: the first attempt that finished cleanly, if any
+            winner = next((future for future in attempts if future.exception() is None), None)
+        for future, attempt_cancel in attempts.items():
+            if future is not winner:
+                attempt_cancel.cancel()
+        failed_retries = sum(future.exception().retries for future in attempts
+                             if future is not winner and future.done()
+                             and isinstance(future.exception(), OllamaError))
+        if winner is None:
+            raise primary.exception()
+
+        result = winner.result()
+        result["retries"] = result.get("retries", 0) + failed_retries
+        if "first_token_seconds" in result:
+            result["first_token_seconds"] += offsets[winner]
+        result["hedge_delay"] = offsets[winner]
+        result["hedged"] = len(attempts) > 1
+        result["hedge_won"] = winner is not primary
+        with self._stats_lock:
+            self.hedged_requests += result["hedged"]
+            self.hedge_wins += result["hedge_won"]
+        if on_text and result.get("response"):
+            on_text(result["response"])
+        return result
+
+    def _post(self, path: str, payload: Dict, timeout: Optional[float], stream: bool,
+              cancel: Optional[Cancellation] = None, exclude: Iterable[Backend] = ()) -> Tuple[object, Backend]:
+        """POST to the least loaded backend, failing over to others on transient errors
+
+        For a streamed call the backend stays acquired and the caller must release it.
+        """
+        attempt = 0
+
+        while True:
+            backend = self.pool.acquire(exclude)
+            if cancel is not None:
+                cancel.backend = backend
+                if cancel.cancelled:
+                    self.pool.release(backend, True)
+                    raise OllamaError("Cancelled", attempt)
+            url = f"{backend.base_url}{path}"
+            started = time.monotonic()
+            try:
+                # Only a streamed response keeps its connection; a finished one goes back to the pool
+                _sending.cancel = cancel if stream else None
+                try:
+                    response = self.session.post(url, json=payload, timeout=timeout or self.timeout,
+                                                 stream=stream)
+                finally:
+                    _sending.cancel = None
+                if response.status_code in TRANSIENT_STATUS_CODES:
+                    if cancel is not None:
+                        cancel.detach()
+                    response.close()
+                    raise TransientResponseError(f"{response.status_code} response from {url}",
+                                                 response=response)
+                response.raise_for_status()
+
+                if stream:
+                    # A streamed body is read by the caller, chunk by chunk
+                    self._record(attempt, failed=False)
+                    return response, backend
+
+                result = response.json()
+                self.pool.release(backend, True, time.monotonic() - started, result.get("eval_count", 0))
+                self._record(attempt, failed=False)
+                return result, backend
+
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.JSONDecodeError, TransientResponseError) as e:
+                if cancel is not None:
+                    cancel.detach()
+                    if cancel.cancelled:
+                        # Most likely our own hang-up, not the backend's fault
+                        self.pool.release(backend, True)
+                        raise OllamaError("Cancelled", attempt) from e
+                self.pool.release(backend, False, time.monotonic() - started)
+                if attempt >= self.max_retries:
+                    self._record(attempt, failed=True)
+                    raise OllamaError(f"{e} (gave up after {attempt} retries)", attempt, transient=True) from e
+
+                delay = self.backoff_delay(attempt)
+                attempt += 1
+                print(f"    ↻ Retry {attempt}/{self.max_retries} in {delay:.1f}s: {e}")
+                time.sleep(delay)
+
+            except requests.exceptions.RequestException as e:
+                # Client errors such as an unknown model will not fix themselves
+                if cancel is not None:
+                    cancel.detach()
+                self.pool.release(backend, False, time.monotonic() - started)
+                self._record(attempt, failed=True)
+                raise OllamaError(str(e), attempt) from e
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record(self, retries: int, failed: bool):
+        self._local.retries = retries
+        with self._stats_lock:
+            self.total_retries += retries
+            if failed:
+                self.failed_requests += 1
+            else:
+                self.retry_counts[retries] += 1
+
+    def stats(self) -> Dict:
+        """Summary of how many retries requests have needed so far"""
+        with self._stats_lock:
+            succeeded = sum(self.retry_counts.values())
+            return {
+                "requests": succeeded + self.failed_requests,
+                "failed_requests": self.failed_requests,
+                "retried_requests": succeeded - self.retry_counts.get(0, 0),
+                "total_retries": self.total_retries,
+                "hedged_requests": self.hedged_requests,
+                "hedge_wins": self.hedge_wins,
+                "retry_histogram": dict(sorted(self.retry_counts.items()))
+            }
+
+    def backend_report(self):
+        """Per-backend health and throughput"""
+        return self.pool.report()
+
+    def close(self):
+        self.pool.stop()
+        self.session.close()
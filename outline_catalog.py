@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, List
+
+OUTLINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "outlines")
+INDEX_FILE = "index.json"
+DEFAULT_KEY = "default"
+
+
+class OutlineCatalog:
+    """Book outline templates stored as JSON files in one directory
+
+    index.json maps topic keys ("data_science") to template files and is the only
+    file read up front. A template is parsed the first time its topic is asked for
+    and kept afterwards, so adding curricula costs nothing until they are used.
+    Template text may contain "{topic}", which is replaced by the book's topic.
+    """
+
+    def __init__(self, directory: str = OUTLINES_DIR):
+        self.directory = directory
+        self._index = None
+        self._templates: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def topic_key(topic: str) -> str:
+        return topic.lower().replace(" ", "_")
+
+    def index(self) -> Dict[str, str]:
+        if self._index is None:
+            with open(os.path.join(self.directory, INDEX_FILE), 'r', encoding='utf-8') as f:
+                self._index = json.load(f)["topics"]
+        return self._index
+
+    def topics(self) -> List[str]:
+        return sorted(self.index())
+
+    def template(self, key: str) -> Dict:
+        """Parsed template for a topic key, falling back to the default template"""
+        filename = self.index().get(key) or self.index()[DEFAULT_KEY]
+        with self._lock:
+            if filename not in self._templates:
+                with open(os.path.join(self.directory, filename), 'r', encoding='utf-8') as f:
+                    self._templates[filename] = json.load(f)
+            return self._templates[filename]
+
+    def outline(self, topic: str) -> Dict:
+        """Fresh part -> chapter -> [section titles] dict for a topic"""
+        title = topic.title()
+
+        def fill(text: str) -> str:
+            return text.replace("{topic}", title)
+
+        parts = self.template(self.topic_key(topic))["parts"]
+        return {fill(part): {fill(chapter): [fill(section) for section in sections]
+                             for chapter, sections in chapters.items()}
+                for part, chapters in parts.items()}
+
+    def rebuild_index(self) -> Dict[str, str]:
+        """Scan the directory and write index.json from each template's "topics" list"""
+        topics = {}
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".json") or filename == INDEX_FILE:
+                continue
+            with open(os.path.join(self.directory, filename), 'r', encoding='utf-8') as f:
+                template = json.load(f)
+            for key in template.get("topics") or [os.path.splitext(filename)[0]]:
+                topics[self.topic_key(key)] = filename
+
+        tmp_path = os.path.join(self.directory, f"{INDEX_FILE}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"topics": topics}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp_path, os.path.join(self.directory, INDEX_FILE))
+
+        self._index = topics
+        return topics
+
+
+@lru_cache(maxsize=None)
+def open_catalog(directory: str = OUTLINES_DIR) -> OutlineCatalog:
+    """One shared catalog per directory, so every generator reuses parsed templates"""
+    return OutlineCatalog(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the outline template catalog")
+    parser.add_argument("--directory", default=OUTLINES_DIR, help="Directory holding the templates")
+    parser.add_argument("--rebuild-index", action="store_true", help="Rewrite index.json from the templates")
+    args = parser.parse_args()
+
+    catalog = OutlineCatalog(args.directory)
+    if args.rebuild_index:
+        topics = catalog.rebuild_index()
+        print(f"📚 Indexed {len(topics)} topics in {os.path.join(args.directory, INDEX_FILE)}")
+    for key in catalog.topics():
+        print(f"   {key}: {catalog.index()[key]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from section_batches import plan_batches
+from section_table import Chapter, Section
+
+
+class ChapterParallelEngine:
+    """Runs several chapters of a book at once, each chapter as its own context chain"""
+
+    def __init__(self, generator, max_concurrency: int = 4, render_every: int = 5,
+                 compact_every: int = 50):
+        self.generator = generator
+        self.max_concurrency = max(1, max_concurrency)
+        self.render_every = render_every
+        self.compact_every = compact_every
+
+        self.total_sections = 0
+        self.completed_sections = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def run(self, topic: str, progress_file: str, output_file: str) -> int:
+        """Generate every pending section and return the number of completed sections"""
+        # The loop's default executor has min(32, cpus + 4) threads, which would quietly cap
+        # the concurrency on small machines; every blocking call gets a thread of its own here
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="bookgen")
+        try:
+            result = await self._run(topic, progress_file, output_file)
+        except asyncio.CancelledError:
+            # Ctrl-C: hang up on the server and drop queued sections instead of waiting for them
+            self.generator.stop()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        except BaseException:
+            # A failed chapter: sections already being written finish and journal their chunks
+            # before the caller closes the journal
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        self._executor.shutdown(wait=True)
+        return result
+
+    async def _in_thread(self, func: Callable, *args):
+        """Run a blocking generator call on the engine's executor"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def _run(self, topic: str, progress_file: str, output_file: str) -> int:
+        sections = self.generator.sections
+
+        self.total_sections = len(sections)
+        self.completed_sections = 0
+
+        # Only this many chapters talk to the server at the same time
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        tasks = []
+        previous_chapter = None
+        for chapter in sections.chapters:
+            tasks.append(self._write_chapter(semaphore, topic, chapter, previous_chapter,
+                                             progress_file, output_file))
+            previous_chapter = chapter
+
+        await asyncio.gather(*tasks)
+        return self.completed_sections
+
+    def _context_for(self, chapter: Chapter, previous_chapter: Optional[Chapter]) -> str:
+        """Tail of the context chain the next section of this chapter continues from"""
+        buffer = self.generator.context_buffer
+
+        # One chapter at a time reads as a single book-wide chain, as before
+        if self.max_concurrency == 1:
+            return buffer.tail()
+
+        context = buffer.chapter_tail(chapter.id)
+        if not context and previous_chapter:
+            # A fresh chapter picks up from the end of the previous one when that exists
+            context = buffer.chapter_tail(previous_chapter.id)
+        return context
+
+    async def _write_chapter(self, semaphore: asyncio.Semaphore, topic: str, chapter: Chapter,
+                             previous_chapter: Optional[Chapter], progress_file: str,
+                             output_file: str):
+        """Write the sections of one chapter in order, chaining context within the chapter
+
+        Short consecutive sections are requested together when the generator has
+        batch_words set; any section the batch did not deliver is written on its own.
+        Sections with journalled chunks are never batched, so they resume from them.
+        """
+        generator = self.generator
+        sections = generator.sections.chapter_sections(chapter)
+
+        pending = [section for section in sections if not section.written]
+        self.completed_sections += len(sections) - len(pending)
+
+        if not pending:
+            print(f"  ✓ {chapter.title} (already completed)")
+            return
+
+        async with semaphore:
+            print(f"  📖 {chapter.title}")
+
+            for batch in plan_batches(pending, generator.batch_words, generator.max_batch_sections,
+                                      single=generator.partials):
+                contents = [None] * len(batch)
+                if len(batch) > 1:
+                    print(f"    ⏳ Writing {len(batch)} sections: {', '.join(section.title for section in batch)}")
+                    contents = await self._in_thread(generator.generate_batch, topic, chapter.part,
+                                                     chapter.title, batch,
+                                                     self._context_for(chapter, previous_chapter))
+
+                for section, content in zip(batch, contents):
+                    if content is None:
+                        print(f"    ⏳ Writing: {section.title}")
+
+                        previous_content = self._context_for(chapter, previous_chapter)
+
+                        # The blocking HTTP call runs in a worker thread so other chapters keep going
+                        content = await self._in_thread(generator.generate_section, topic,
+                                                        chapter.part, chapter.title, section,
+                                                        previous_content)
+
+                    self._finish_section(topic, chapter, section, content, progress_file, output_file)
+
+    def _finish_section(self, topic: str, chapter: Chapter, section: Section, content: str,
+                        progress_file: str, output_file: str):
+        """Record a written section, checkpoint now and then and report progress"""
+        if content:
+            self.generator.record_section(section, content)
+            self.generator.context_buffer.append(chapter.id, content)
+            self.completed_sections += 1
+
+            print(f"    ✅ Completed: {section.title} ({len(content.split())} words)")
+
+            # Every section is already journalled; fold the journal into a snapshot now and then
+            journal = self.generator.journal
+            if journal and journal.records_since_compaction >= self.compact_every:
+                self.generator.save_progress(progress_file)
+
+            if self.completed_sections % self.render_every == 0:
+                self.generator.save_book_to_file(topic, output_file)
+        else:
+            print(f"    ❌ Failed to generate content: {section.title}")
+
+        # Progress update
+        progress = (self.completed_sections / self.total_sections) * 100
+        print(f"    Progress: {self.completed_sections}/{self.total_sections} ({progress:.1f}%)")
+
+
+class PlanThenWriteEngine(ChapterParallelEngine):
+    """Plans every chapter first, then writes all pending sections independently
+
+    Continuity comes from each section's brief (key points, terms introduced earlier,
+    transitions) instead of the tail of the previous section, so no section waits for
+    another and the fan-out is across sections, bounded only by the server slots.
+    """
+
+    async def _run(self, topic: str, progress_file: str, output_file: str) -> int:
+        generator = self.generator
+        sections = generator.sections
+
+        pending = [section for section in sections if not section.written]
+        self.total_sections = len(sections)
+        self.completed_sections = self.total_sections - len(pending)
+
+        # Chapter by chapter, so each plan knows the terms the chapters before it introduce
+        planned_chapters = {section.chapter_id for section in pending if section.id not in generator.briefs}
+        for chapter_id in sorted(planned_chapters):
+            await self._in_thread(generator.plan_chapter, topic, chapter_id)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        await asyncio.gather(*(self._write_section(semaphore, topic, section, progress_file, output_file)
+                               for section in pending))
+        return self.completed_sections
+
+    async def _write_section(self, semaphore: asyncio.Semaphore, topic: str, section: Section,
+                             progress_file: str, output_file: str):
+        chapter = self.generator.sections.chapters[section.chapter_id]
+        async with semaphore:
+            print(f"    ⏳ Writing: {section.title}")
+            content = await self._in_thread(self.generator.generate_section, topic, chapter.part,
+                                            chapter.title, section, "",
+                                            self.generator.section_brief(section))
+        self._finish_section(topic, chapter, section, content, progress_file, output_file)
@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from near_duplicates import NearDuplicateIndex, minhash_signature
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def clean_generated_content(content: str) -> str:
+    """Clean and format generated content"""
+    # Remove common artifacts from generation
+    content = content.strip()
+
+    # Remove repetitive phrases that might occur
+    lines = content.split('\n')
+    cleaned_lines = []
+    prev_line = ""
+
+    for line in lines:
+        line = line.strip()
+        if line and line != prev_line:  # Remove duplicate consecutive lines
+            cleaned_lines.append(line)
+            prev_line = line
+        elif line:  # Keep empty lines for formatting
+            cleaned_lines.append(line)
+
+    return '\n'.join(cleaned_lines)
+
+
+def repeated_sentence_ratio(text: str) -> float:
+    """Share of sentences that already appeared earlier in the text"""
+    sentences = [sentence.strip().lower() for sentence in _SENTENCE_RE.split(text) if sentence.strip()]
+    if not sentences:
+        return 0.0
+    return 1 - len(set(sentences)) / len(sentences)
+
+
+def process_chunk(text: str, clean: bool, num_perm: int, shingle_size: int, seed: int) -> Dict:
+    """All CPU work on one raw chunk: signature, cleaning, word count and repetition
+
+    The signature is taken from the raw text, as the duplicate check always did.
+    Runs in a worker process, so it only takes and returns picklable values.
+    """
+    content = clean_generated_content(text) if clean else text
+    return {
+        "content": content,
+        "word_count": len(content.split()),
+        "signature": minhash_signature(text, num_perm, shingle_size, seed),
+        "repetition": repeated_sentence_ratio(content)
+    }
+
+
+class ChunkPostProcessor:
+    """Process pool that turns raw generated chunks into cleaned, annotated ones
+
+    Generation threads submit a chunk and collect the result only when they need it,
+    typically after generating the next chunk, so the CPU work runs on another core
+    while the server keeps streaming. Only the LSH lookup on the returned signature
+    stays in this process. workers=0 runs everything inline.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        # Leave a core for the generation threads; on a single core the pool only adds overhead
+        self.workers = min(4, (os.cpu_count() or 1) - 1) if workers is None else workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn, because forking a process that is running threads can deadlock
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def submit(self, text: str, clean: bool, index: NearDuplicateIndex) -> Future:
+        args = (text, clean, index.num_perm, index.shingle_size, index.seed)
+        if self.workers > 0:
+            try:
+                return self._executor().submit(process_chunk, *args)
+            except BrokenProcessPool:
+                # A worker died since the last chunk; start a fresh pool next time
+                self.close()
+        future = Future()
+        future.set_result(process_chunk(*args))
+        return future
+
+    def collect(self, future: Future, text: str, clean: bool, index: NearDuplicateIndex) -> Dict:
+        """Result of a submit() for the same chunk, waiting for it if need be"""
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool next time and do this chunk here
+            self.close()
+            return process_chunk(text, clean, index.num_perm, index.shingle_size, index.seed)
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
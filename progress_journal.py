@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+def write_snapshot(path: str, data: Dict):
+    """Atomically replace path with data: write a temp file, fsync, then rename"""
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    # Make the rename itself durable
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class ProgressJournal:
+    """Append-only JSONL write-ahead journal next to a progress snapshot
+
+    Every completed unit of work is appended as one JSON line, so a checkpoint costs
+    O(section) rather than O(book). Lines are flushed immediately and fsynced in
+    batches. compact() folds everything into a fresh snapshot and empties the
+    journal; loading reads the snapshot and replays the journal tail on top.
+
+    Records may be appended from several threads. Hold `lock` while building a
+    snapshot for compact() so no record lands between the two.
+    """
+
+    def __init__(self, snapshot_path: str, fsync_every: int = 4, fsync_interval: float = 1.0):
+        self.snapshot_path = snapshot_path
+        self.journal_path = self.journal_path_for(snapshot_path)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self.records_since_compaction = 0
+        self.lock = threading.RLock()
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    @staticmethod
+    def journal_path_for(snapshot_path: str) -> str:
+        return f"{os.path.splitext(snapshot_path)[0]}.journal.jsonl"
+
+    def append(self, record: Dict):
+        """Append one record; it survives a process crash at once, power loss after the next fsync"""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            if self._file is None:
+                self._file = open(self.journal_path, 'a', encoding='utf-8')
+
+            self._file.write(line)
+            self._file.flush()
+            self._unsynced += 1
+            self.records_since_compaction += 1
+
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self.sync()
+
+    def sync(self):
+        with self.lock:
+            if self._file is not None and self._unsynced:
+                os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def compact(self, snapshot: Dict):
+        """Write a full snapshot atomically, then start an empty journal"""
+        with self.lock:
+            self.sync()
+            write_snapshot(self.snapshot_path, snapshot)
+
+            # Records are idempotent, so a crash between these two steps only replays them again
+            self.close()
+            with open(self.journal_path, 'w', encoding='utf-8') as f:
+                os.fsync(f.fileno())
+            self.records_since_compaction = 0
+
+    def reset(self):
+        """Forget journalled records, e.g. when starting a book from scratch"""
+        with self.lock:
+            self.close()
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self.records_since_compaction = 0
+
+    def close(self):
+        with self.lock:
+            if self._file is not None:
+                self.sync()
+                self._file.close()
+                self._file = None
+
+    @classmethod
+    def read(cls, snapshot_path: str) -> Tuple[Optional[Dict], List[Dict]]:
+        """Return the snapshot (None if missing) and the journal records written after it"""
+        snapshot = None
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+
+        records = []
+        journal_path = cls.journal_path_for(snapshot_path)
+        if os.path.exists(journal_path):
+            with open(journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A torn line from a crash mid-write; the records around it are intact
+                        continue
+
+        return snapshot, records
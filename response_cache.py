@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache of LLM responses, backed by SQLite
+
+    Keys are a SHA-256 over model, sampling options and prompt, so a rerun with the
+    same inputs is answered from disk. Entries older than max_age_days are dropped
+    and the least recently used ones are evicted once max_bytes is exceeded.
+    """
+
+    def __init__(self, path: str = "llm_response_cache.sqlite3", max_bytes: int = 512 * 1024 * 1024,
+                 max_age_days: float = 30, bypass: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.bypass = bypass  # Skip lookups (fresh answers are still stored)
+
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.evict()
+
+    @staticmethod
+    def make_key(model: str, options: Dict, prompt: str, **extra) -> str:
+        """Hash everything that influences the response"""
+        material = {"model": model, "options": options, "prompt": prompt}
+        material.update({name: value for name, value in extra.items() if value is not None})
+        encoded = json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss"""
+        if self.bypass:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, size, created FROM responses WHERE key = ?",
+                                     (key,)).fetchone()
+
+            if row is None or now - row[2] > self.max_age:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._total_bytes -= row[1]
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """Store a response and evict old entries if the cache grew past its budget"""
+        size = len(response.encode("utf-8"))
+        now = time.time()
+
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO responses (key, response, size, created, accessed) "
+                               "VALUES (?, ?, ?, ?, ?)", (key, response, size, now, now))
+            self._total_bytes += size - (previous[0] if previous else 0)
+
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,))
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+            if self._total_bytes <= self.max_bytes:
+                return
+
+            # Free down to 90% so we do not evict again on the very next put
+            to_free = self._total_bytes - int(self.max_bytes * 0.9)
+            victims = []
+            for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                victims.append((key,))
+                to_free -= size
+                if to_free <= 0:
+                    break
+
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": self._total_bytes
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
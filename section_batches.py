@@ -0,0 +1,65 @@
+import re
+from typing import Container, List, Optional
+
+from section_table import Section
+
+SECTION_MARKER = "=== SECTION {number}: {title} ==="
+
+# Tolerates markdown heading hashes and a reworded title, but not a missing number
+_MARKER_RE = re.compile(r"^[ \t#*]*=+[ \t]*SECTION[ \t]+(\d+)\b[^\n]*?=+[ \t*]*$", re.IGNORECASE | re.MULTILINE)
+
+
+def plan_batches(sections: List[Section], batch_words: int, max_sections: int,
+                 single: Container[int] = ()) -> List[List[Section]]:
+    """Group consecutive sections so each group's target words fit in one request
+
+    A batch_words of 0 leaves every section on its own, as does listing its id in
+    `single`.
+    """
+    batches = []
+    current: List[Section] = []
+    words = 0
+    for section in sections:
+        if section.id in single:
+            if current:
+                batches.append(current)
+            batches.append([section])
+            current, words = [], 0
+            continue
+        if current and (words + section.target_words > batch_words or len(current) >= max_sections):
+            batches.append(current)
+            current, words = [], 0
+        current.append(section)
+        words += section.target_words
+    if current:
+        batches.append(current)
+    return batches
+
+
+def split_batch_response(text: str, sections: List[Section], min_fraction: float = 0.5) -> List[Optional[str]]:
+    """Cut a batched answer at its marker lines into one body per section
+
+    A section gets None when its marker is missing or repeated, or when its body has
+    less than min_fraction of the section's target words (usually a truncated answer).
+    """
+    bodies: List[Optional[str]] = [None] * len(sections)
+    seen = set()
+    repeated = set()
+
+    matches = list(_MARKER_RE.finditer(text))
+    for match, following in zip(matches, matches[1:] + [None]):
+        number = int(match.group(1))
+        if not 1 <= number <= len(sections):
+            continue
+        if number in seen:
+            repeated.add(number)
+            continue
+        seen.add(number)
+
+        body = text[match.end():following.start() if following else len(text)].strip()
+        if len(body.split()) >= sections[number - 1].target_words * min_fraction:
+            bodies[number - 1] = body
+
+    for number in repeated:
+        bodies[number - 1] = None
+    return bodies
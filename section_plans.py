@@ -0,0 +1,85 @@
+import json
+import re
+from typing import Dict, List
+
+from section_table import Section, SectionTable
+
+_JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+MAX_KEY_POINTS = 6
+MAX_KNOWN_TERMS = 40  # Terms from earlier sections listed in a writing prompt
+PLAN_TOKENS_PER_SECTION = 300  # num_predict per section of a planning call; JSON takes many tokens per word
+PROMPT_CHARS_PER_TOKEN = 3  # Deliberately low, so a prompt's token count is overestimated
+
+
+def default_brief(table: SectionTable, section: Section) -> Dict:
+    """Brief built from the outline alone, for sections the planner gave nothing usable"""
+    siblings = table.chapter_sections(table.chapters[section.chapter_id])
+    previous = siblings[section.index - 1].title if section.index > 0 else None
+    following = siblings[section.index + 1].title if section.index + 1 < len(siblings) else None
+    return {
+        "key_points": [section.title],
+        "terms": [],
+        "transition_in": f"Follows \"{previous}\"" if previous else "Opens the chapter",
+        "transition_out": f"Leads into \"{following}\"" if following else "Closes the chapter",
+        "planned": False
+    }
+
+
+def _strings(value, limit: int) -> List[str]:
+    if not isinstance(value, list):
+        return []
+    return [str(item).strip() for item in value if str(item).strip()][:limit]
+
+
+def parse_briefs(text: str, sections: List[Section], table: SectionTable) -> Dict[int, Dict]:
+    """Briefs by section id from the planner's JSON answer
+
+    Entries are matched to sections by position. Anything missing or malformed gets
+    the outline-only default_brief(), so a bad plan never blocks writing.
+    """
+    briefs = {section.id: default_brief(table, section) for section in sections}
+
+    match = _JSON_RE.search(text)
+    try:
+        entries = json.loads(match.group(0))["sections"] if match else []
+    except (ValueError, KeyError, TypeError):
+        entries = []
+    if not isinstance(entries, list):
+        entries = []
+
+    for section, entry in zip(sections, entries):
+        if not isinstance(entry, dict):
+            continue
+        key_points = _strings(entry.get("key_points"), MAX_KEY_POINTS)
+        if not key_points:
+            continue
+        brief = briefs[section.id]
+        brief.update(key_points=key_points, terms=_strings(entry.get("terms"), 10), planned=True)
+        for field in ("transition_in", "transition_out"):
+            if isinstance(entry.get(field), str) and entry[field].strip():
+                brief[field] = entry[field].strip()
+    return briefs
+
+
+def known_terms(briefs: Dict[int, Dict], section: Section) -> List[str]:
+    """Terms introduced by the sections before this one, most recent last"""
+    terms = {}
+    for section_id in sorted(section_id for section_id in briefs if section_id < section.id):
+        for term in briefs[section_id].get("terms", []):
+            terms.pop(term.lower(), None)
+            terms[term.lower()] = term
+    return list(terms.values())[-MAX_KNOWN_TERMS:]
+
+
+def render_brief(brief: Dict, introduced: List[str]) -> str:
+    """Brief as prompt text"""
+    lines = ["Key points to cover:"]
+    lines.extend(f"- {point}" for point in brief["key_points"])
+    if brief.get("terms"):
+        lines.append(f"New terms to introduce: {', '.join(brief['terms'])}")
+    if introduced:
+        lines.append(f"Terms already introduced earlier in the book (use without re-defining): {', '.join(introduced)}")
+    lines.append(f"Transition in: {brief['transition_in']}")
+    lines.append(f"Transition out: {brief['transition_out']}")
+    return "\n".join(lines)
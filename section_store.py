@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Iterator
+
+
+class SectionStore(MutableMapping):
+    """Section bodies in a SQLite file, read on demand
+
+    A SectionTable keeps ids, word counts and timestamps in memory and looks bodies
+    up here by section id, so a book's text stays on disk apart from the last
+    `cache_size` bodies used. Every write is committed, which makes the store as
+    durable as the progress journal.
+    """
+
+    persistent = True  # Snapshots of a table using this store leave the bodies out
+
+    def __init__(self, path: str, cache_size: int = 32):
+        self.path = path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[int, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS bodies (id INTEGER PRIMARY KEY, content TEXT NOT NULL)")
+        self._conn.commit()
+
+    def _remember(self, section_id: int, content: str):
+        self._cache[section_id] = content
+        self._cache.move_to_end(section_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def __getitem__(self, section_id: int) -> str:
+        with self._lock:
+            if section_id in self._cache:
+                self._cache.move_to_end(section_id)
+                return self._cache[section_id]
+            row = self._conn.execute("SELECT content FROM bodies WHERE id = ?", (section_id,)).fetchone()
+            if row is None:
+                raise KeyError(section_id)
+            self._remember(section_id, row[0])
+            return row[0]
+
+    def __setitem__(self, section_id: int, content: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO bodies (id, content) VALUES (?, ?)", (section_id, content))
+            self._conn.commit()
+            self._remember(section_id, content)
+
+    def __delitem__(self, section_id: int):
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM bodies WHERE id = ?", (section_id,)).rowcount
+            self._conn.commit()
+            self._cache.pop(section_id, None)
+        if not deleted:
+            raise KeyError(section_id)
+
+    def __contains__(self, section_id) -> bool:
+        with self._lock:
+            if section_id in self._cache:
+                return True
+            return self._conn.execute("SELECT 1 FROM bodies WHERE id = ?", (section_id,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[int]:
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute("SELECT id FROM bodies ORDER BY id")]
+        return iter(ids)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM bodies").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM bodies")
+            self._conn.commit()
+            self._cache.clear()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
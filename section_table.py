@@ -0,0 +1,193 @@
+from typing import Dict, Iterator, List, MutableMapping, Optional, Tuple
+
+# Progress files written before the section table kept "book_structure" and "written_content"
+FORMAT_VERSION = 2
+
+
+class Chapter:
+    """A chapter and the contiguous range of section ids it owns"""
+
+    __slots__ = ("id", "part", "title", "start", "stop")
+
+    def __init__(self, chapter_id: int, part: str, title: str, start: int, stop: int):
+        self.id = chapter_id
+        self.part = part
+        self.title = title
+        self.start = start
+        self.stop = stop
+
+
+class Section:
+    """One section of the outline and, once written, its content
+
+    The body lives in the table's body mapping and is only looked up when `content`
+    is read; `written` answers "is there a body" without touching it.
+    """
+
+    __slots__ = ("id", "chapter_id", "index", "title", "target_words", "written", "word_count", "timestamp",
+                 "_bodies")
+
+    def __init__(self, section_id: int, chapter_id: int, index: int, title: str, target_words: int,
+                 bodies: MutableMapping[int, str]):
+        self.id = section_id
+        self.chapter_id = chapter_id
+        self.index = index  # Position within its chapter
+        self.title = title
+        self.target_words = target_words
+        self.written = False
+        self.word_count = 0
+        self.timestamp = ""
+        self._bodies = bodies
+
+    @property
+    def content(self) -> Optional[str]:
+        return self._bodies.get(self.id) if self.written else None
+
+
+class SectionTable:
+    """Flat table of every section in the book, in reading order
+
+    Section ids are positions in the table and never change for a given outline,
+    so the journal, the renderer and the context buffer refer to sections by
+    integer instead of by "part|chapter|idx" strings. Each chapter owns a
+    contiguous id range; (part, chapter, idx) lookups go through one dict.
+
+    Section bodies are kept in `bodies`, any mapping from section id to text: a
+    dict by default, or a disk-backed SectionStore for books that should not be
+    held in memory.
+    """
+
+    def __init__(self, bodies: Optional[MutableMapping[int, str]] = None):
+        self.bodies = {} if bodies is None else bodies
+        self.chapters: List[Chapter] = []
+        self.sections: List[Section] = []
+        self._index: Dict[Tuple[str, str, int], int] = {}
+        self.written_count = 0
+        self.total_words = 0
+
+    @classmethod
+    def from_outline(cls, book_structure: Dict, bodies: Optional[MutableMapping[int, str]] = None) -> "SectionTable":
+        """Build the table from create_book_outline()'s nested part -> chapter -> sections dict"""
+        table = cls(bodies)
+        for part_name, chapters in book_structure.items():
+            for chapter_name, sections in chapters.items():
+                table.add_chapter(part_name, chapter_name,
+                                  [(section['title'], section['target_words']) for section in sections])
+        return table
+
+    def add_chapter(self, part: str, title: str, sections: List[Tuple[str, int]]) -> Chapter:
+        start = len(self.sections)
+        chapter = Chapter(len(self.chapters), part, title, start, start + len(sections))
+        self.chapters.append(chapter)
+
+        for index, (section_title, target_words) in enumerate(sections):
+            section_id = start + index
+            self.sections.append(Section(section_id, chapter.id, index, section_title, target_words, self.bodies))
+            self._index[(part, title, index)] = section_id
+        return chapter
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    def __iter__(self) -> Iterator[Section]:
+        return iter(self.sections)
+
+    def __getitem__(self, section_id: int) -> Section:
+        return self.sections[section_id]
+
+    def id_of(self, part: str, chapter: str, index: int) -> Optional[int]:
+        return self._index.get((part, chapter, index))
+
+    def id_of_key(self, key: str) -> Optional[int]:
+        """Id of a legacy "part|chapter|idx" key"""
+        head, _, index = key.rpartition("|")
+        # Titles may contain "|" themselves, so try every split of the head
+        position = head.find("|")
+        while position != -1 and index.isdigit():
+            section_id = self.id_of(head[:position], head[position + 1:], int(index))
+            if section_id is not None:
+                return section_id
+            position = head.find("|", position + 1)
+        return None
+
+    def chapter_of(self, section: Section) -> Chapter:
+        return self.chapters[section.chapter_id]
+
+    def chapter_sections(self, chapter: Chapter) -> List[Section]:
+        return self.sections[chapter.start:chapter.stop]
+
+    def written(self) -> Iterator[Section]:
+        return (section for section in self.sections if section.written)
+
+    def write(self, section_id: int, content: str, word_count: Optional[int] = None,
+              timestamp: str = "") -> Section:
+        """Store the content of a section, replacing any earlier version"""
+        self.bodies[section_id] = content
+        return self._mark_written(section_id, len(content.split()) if word_count is None else word_count,
+                                  timestamp)
+
+    def _mark_written(self, section_id: int, word_count: int, timestamp: str) -> Section:
+        section = self.sections[section_id]
+        if not section.written:
+            self.written_count += 1
+        else:
+            self.total_words -= section.word_count
+
+        section.written = True
+        section.word_count = word_count
+        section.timestamp = timestamp
+        self.total_words += section.word_count
+        return section
+
+    def to_dict(self) -> Dict:
+        """Compact form: parts and chapters are listed once, sections and content as rows
+
+        With a persistent body store the content rows carry no text, only what is
+        needed to find it again.
+        """
+        parts: Dict[str, int] = {}
+        for chapter in self.chapters:
+            parts.setdefault(chapter.part, len(parts))
+
+        if getattr(self.bodies, "persistent", False):
+            content = [[section.id, section.word_count, section.timestamp] for section in self.written()]
+        else:
+            content = [[section.id, section.word_count, section.timestamp, section.content]
+                       for section in self.written()]
+
+        return {
+            "format": FORMAT_VERSION,
+            "parts": list(parts),
+            "chapters": [[parts[chapter.part], chapter.title, chapter.stop - chapter.start]
+                         for chapter in self.chapters],
+            "sections": [[section.title, section.target_words] for section in self.sections],
+            "content": content
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, bodies: Optional[MutableMapping[int, str]] = None) -> "SectionTable":
+        """Rebuild a table; rows with text are written into `bodies`, rows without are looked up there"""
+        table = cls(bodies)
+        rows = data["sections"]
+        for part_index, title, count in data["chapters"]:
+            start = len(table.sections)
+            table.add_chapter(data["parts"][part_index], title, [tuple(row) for row in rows[start:start + count]])
+
+        for row in data.get("content", []):
+            section_id, word_count, timestamp = row[:3]
+            if len(row) > 3:
+                table.write(section_id, row[3], word_count, timestamp)
+            elif section_id in table.bodies:
+                table._mark_written(section_id, word_count, timestamp)
+        return table
+
+    @classmethod
+    def from_legacy(cls, book_structure: Dict, written_content: Dict,
+                    bodies: Optional[MutableMapping[int, str]] = None) -> "SectionTable":
+        """Convert the nested dict and "part|chapter|idx" keyed content of older progress files"""
+        table = cls.from_outline(book_structure, bodies)
+        for key, entry in written_content.items():
+            section_id = table.id_of_key(key)
+            if section_id is not None:
+                table.write(section_id, entry['content'], entry.get('word_count'), entry.get('timestamp', ""))
+        return table
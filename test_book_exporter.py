@@ -0,0 +1,40 @@
+import unittest
+from xml.dom import minidom
+
+from book_exporter import inline_html, markdown_to_html, render_chapter
+
+
+def well_formed(fragment: str):
+    return minidom.parseString(f"<div>{fragment}</div>")
+
+
+class InlineHtmlTest(unittest.TestCase):
+    CASES = {
+        "Use `*` as a wildcard, e.g. *example*":
+            "Use <code>*</code> as a wildcard, e.g. <em>example</em>",
+        "Glob `*.py` files and `**/*.md` files":
+            "Glob <code>*.py</code> files and <code>**/*.md</code> files",
+        "**Bold with *italic** crossing*":
+            "<strong>Bold with *italic</strong> crossing*",
+        "**a `x<y`** and *b* & c":
+            "<strong>a <code>x&lt;y</code></strong> and <em>b</em> &amp; c",
+    }
+
+    def test_cases(self):
+        for text, expected in self.CASES.items():
+            with self.subTest(text=text):
+                rendered = inline_html(text)
+                self.assertEqual(rendered, expected)
+                well_formed(rendered)
+
+    def test_markdown_document_is_well_formed(self):
+        text = "# Title\n\n" + "\n\n".join(self.CASES) + "\n\n- `*` item *one*\n\n```\n**raw**\n```"
+        well_formed(markdown_to_html(text))
+
+    def test_epub_chapter_is_well_formed(self):
+        sections = [(text, text, 0) for text in self.CASES] + [("Pending", None, 0)]
+        minidom.parseString(render_chapter(1, "Part I", "Chapter", sections, ("epub",))["xhtml"])
+
+
+if __name__ == "__main__":
+    unittest.main()